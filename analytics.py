@@ -0,0 +1,151 @@
+import json, hashlib, threading
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from content_schema import METRICAS, JANELAS, compile_extractor, pick
+
+PERCENTIS = (0.25, 0.5, 0.75, 0.9)
+METRICAS_7D = [f"{m}_7d" for m in METRICAS]
+
+# todas as colunas numéricas + dimensões usadas nos agrupamentos
+extract_row = compile_extractor(
+    pick("titulo", "tipo", "trafego_pago", "orcamento", "plataformas",
+         *(f"{m}_{j}" for m in METRICAS for j in JANELAS),
+         "engajamento_total", "taxa_engajamento",
+         tipo="Não definido")
+)
+
+
+def extract_rows(pages: Iterable[dict]) -> List[dict]:
+    """Só os campos que entram no relatório, uma linha por post."""
+    return [{"id": p["id"], **extract_row(p.get("properties", {}))} for p in pages]
+
+
+def fingerprint(rows: List[dict]) -> str:
+    """
+    Hash dos valores extraídos: muda sempre que uma página entra, sai ou tem algum campo do relatório
+    editado. Não usa o last_edited_time do Notion, que é arredondado para o minuto.
+    """
+    h = hashlib.sha1()
+    for row in sorted(rows, key=lambda r: r["id"]):
+        h.update(json.dumps(row, sort_keys=True, ensure_ascii=False, default=str).encode())
+    return h.hexdigest()
+
+
+def build_frame(rows: List[dict]) -> pd.DataFrame:
+    """Uma linha por post (saída de `extract_rows`), colunas numéricas em float (NaN para métrica não preenchida)."""
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    numeric = ["orcamento", "engajamento_total", "taxa_engajamento"] + \
+              [f"{m}_{j}" for m in METRICAS for j in JANELAS]
+    df[numeric] = df[numeric].apply(pd.to_numeric, errors="coerce").astype("float64")
+    df["pago"] = df["trafego_pago"].fillna("").str.strip().str.lower().eq("sim")
+    return df
+
+
+def _clean(value):
+    """numpy/NaN -> tipos JSON."""
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else round(float(value), 4)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def _aggregate(df: pd.DataFrame, by: str) -> dict:
+    result = df.groupby(by, dropna=False).agg(
+        posts=("id", "size"),
+        **{f"{c}_total": (c, "sum") for c in METRICAS_7D + ["engajamento_total", "orcamento"]},
+        **{f"{c}_medio": (c, "mean") for c in METRICAS_7D + ["engajamento_total", "taxa_engajamento"]},
+    )
+    return result.to_dict(orient="index")
+
+
+def _growth(df: pd.DataFrame) -> dict:
+    """Razões 1h→24h e 24h→7d por métrica (mediana e média entre os posts com denominador > 0)."""
+    out = {}
+    for m in METRICAS:
+        h1, h24, d7 = (df[f"{m}_{j}"].to_numpy() for j in JANELAS)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r1 = np.where(h1 > 0, h24 / h1, np.nan)
+            r2 = np.where(h24 > 0, d7 / h24, np.nan)
+        out[m] = {
+            "1h_24h": {"mediana": np.nanmedian(r1) if np.isfinite(r1).any() else np.nan,
+                       "media": np.nanmean(r1) if np.isfinite(r1).any() else np.nan},
+            "24h_7d": {"mediana": np.nanmedian(r2) if np.isfinite(r2).any() else np.nan,
+                       "media": np.nanmean(r2) if np.isfinite(r2).any() else np.nan},
+        }
+    return out
+
+
+def _cost_per_engagement(df: pd.DataFrame) -> dict:
+    paid = df[(df["orcamento"] > 0) & (df["engajamento_total"] > 0)]
+    if paid.empty:
+        return {"posts": 0}
+    cpe = paid["orcamento"] / paid["engajamento_total"]
+    return {
+        "posts": len(paid),
+        "geral": (paid["orcamento"].sum() / paid["engajamento_total"].sum()),
+        "mediana": cpe.median(),
+        "por_tipo": (paid.groupby("tipo")["orcamento"].sum() /
+                     paid.groupby("tipo")["engajamento_total"].sum()).to_dict(),
+    }
+
+
+def engagement_report(df: pd.DataFrame) -> dict:
+    if df.empty:
+        return {"posts": 0}
+
+    por_plataforma = df.explode("plataformas")
+    por_plataforma["plataformas"] = por_plataforma["plataformas"].fillna("Sem plataforma")
+
+    report = {
+        "posts": len(df),
+        "por_tipo": _aggregate(df, "tipo"),
+        "por_plataforma": _aggregate(por_plataforma, "plataformas"),
+        "pago_vs_organico": {
+            ("pago" if k else "organico"): v
+            for k, v in _aggregate(df, "pago").items()
+        },
+        "percentis": {
+            col: {f"p{int(q * 100)}": v for q, v in df[col].quantile(PERCENTIS).items()}
+            for col in ["engajamento_total", "taxa_engajamento"] + METRICAS_7D
+        },
+        "crescimento": _growth(df),
+        "custo_por_engajamento": _cost_per_engagement(df),
+    }
+    return _clean(report)
+
+
+class EngagementCache:
+    """Guarda o último relatório; só recalcula quando o fingerprint dos dados muda."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key: Optional[str] = None
+        self._report: Optional[dict] = None
+
+    def get(self, pages: List[dict]) -> dict:
+        rows = extract_rows(pages)
+        key = fingerprint(rows)
+        with self._lock:
+            if key == self._key:
+                self.hits += 1
+                return self._report
+            self.misses += 1
+        report = engagement_report(build_frame(rows))
+        report["versao"] = key[:12]
+        with self._lock:
+            self._key, self._report = key, report
+        return report
@@ -1,51 +1,217 @@
+import os, json
+from collections import Counter
 from datetime import datetime
+from typing import Iterable, Optional
+
+from title_index import normalize_title
+
+SNAPSHOT_FILE = "status_anterior.json"
+RELATORIO_FILE = "relatorio_kanban.txt"
+
+
+def _select_name(props: dict, name: str) -> Optional[str]:
+    select = (props.get(name) or {}).get("select") or {}
+    return select.get("name")
 
-def gerar_relatorio_kanban():
-    # Simulação dos dados que viriam do Notion (substitua por integração real, se houver)
-    status_counts = {
-        "Em Planejamento": 2,
-        "Ideias para Post": 2,
-        "Relatório": 1,
-        "Em Criação": 1,
-        "Ideias Aprovadas": 1
-    }
 
-    tipo_post_counts = {
-        "Sem Tipo de post": 5,
-        "Vídeo": 1,
-        "Reels": 1
+def card_state(page: dict) -> dict:
+    """Estado mínimo de um card guardado no snapshot."""
+    props = page.get("properties", {})
+    nome = "".join(t.get("plain_text", "") for t in (props.get("Nome") or {}).get("title") or [])
+    return {
+        "nome": nome or "Sem título",
+        "status": _select_name(props, "Status"),
+        "tipo": _select_name(props, "Tipo de post"),
+        "last_edited_time": page.get("last_edited_time"),
     }
 
-    alteracoes_detectadas = "Nenhuma mudança significativa detectada."
 
-    insights = [
-        "⚠️ Poucos cards em 'Em Criação'. Considere mover ideias aprovadas para esta etapa.",
-        "📌 5 cards estão sem tipo de post definido.",
-        "🎨 Nenhum carrossel ou foto planejado. Considere diversificar os formatos de conteúdo."
-    ]
+class KanbanSnapshot:
+    """
+    Snapshot compacto do Kanban (id -> status, tipo, last_edited_time) + marcas d'água.
+    `apply` recebe só as páginas alteradas desde a última análise e calcula o delta em O(mudanças);
+    `replace_all` / `full_sweep` são o caminho sem réplica, comparando a listagem completa com o snapshot
+    lote a lote (só os ids vistos ficam em memória).
+    """
+
+    def __init__(self, cards: Optional[dict] = None, watermark: Optional[str] = None,
+                 archived_after: float = 0.0):
+        self.cards = cards or {}
+        self.watermark = watermark            # maior last_edited_time (relógio do Notion) já visto
+        self.archived_after = archived_after  # maior archived_at (relógio local da réplica) já visto
+
+    # ---------- PERSISTÊNCIA ----------
+    @classmethod
+    def load(cls, path: str = SNAPSHOT_FILE) -> "KanbanSnapshot":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls()
+        if "cards" not in data:
+            # formato antigo (só contagens por status): não dá para comparar card a card
+            return cls()
+        return cls(data["cards"], data.get("watermark"), data.get("archived_after", 0.0))
+
+    def save(self, path: str = SNAPSHOT_FILE):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "watermark": self.watermark,
+                "archived_after": self.archived_after,
+                "cards": self.cards,
+            }, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    # ---------- DELTA ----------
+    def apply(self, pages: Iterable[dict]) -> dict:
+        primeira = not self.cards and self.watermark is None
+        delta = {"novos": [], "movidos": [], "arquivados": []}
+        self._apply(delta, pages)
+        delta["primeira_analise"] = primeira
+        return delta
+
+    def _apply(self, delta: dict, pages: Iterable[dict]):
+        for page in pages:
+            page_id = page["id"]
+            antes = self.cards.get(page_id)
+            archived_at = page.get("archived_at") or 0.0
+            self.archived_after = max(self.archived_after, archived_at)
+
+            if page.get("archived") or page.get("in_trash"):
+                if antes is not None:
+                    delta["arquivados"].append({"id": page_id, "nome": antes["nome"], "status": antes["status"]})
+                    del self.cards[page_id]
+                continue
+
+            depois = card_state(page)
+            edited = depois["last_edited_time"]
+            if edited and (self.watermark is None or edited > self.watermark):
+                self.watermark = edited
+
+            if antes is None:
+                delta["novos"].append({"id": page_id, "nome": depois["nome"], "status": depois["status"]})
+            elif antes["status"] != depois["status"]:
+                delta["movidos"].append({"id": page_id, "nome": depois["nome"],
+                                         "de": antes["status"], "para": depois["status"]})
+            self.cards[page_id] = depois
+
+    def full_sweep(self) -> "FullSweep":
+        return FullSweep(self)
+
+    def replace_all(self, pages: Iterable[dict]) -> dict:
+        sweep = self.full_sweep()
+        sweep.add(pages)
+        return sweep.finish()
+
+    def counts(self, missing: str = "Indefinido"):
+        status = Counter(c["status"] or missing for c in self.cards.values())
+        tipo = Counter(c["tipo"] or missing for c in self.cards.values())
+        return status, tipo
+
 
-    hoje = datetime.now().strftime("%d/%m/%Y")
+class FullSweep:
+    """
+    Comparação da listagem completa com o snapshot, alimentada lote a lote (ex.: páginas do
+    databases/query conforme chegam). `finish` arquiva o que estava no snapshot e não apareceu.
+    """
+
+    def __init__(self, snapshot: KanbanSnapshot):
+        self.snapshot = snapshot
+        self.primeira = not snapshot.cards and snapshot.watermark is None
+        self.delta = {"novos": [], "movidos": [], "arquivados": []}
+        self.vistos = set()
+
+    def add(self, pages: Iterable[dict]):
+        self.snapshot._apply(self.delta, self._track(pages))
+
+    def _track(self, pages: Iterable[dict]):
+        for page in pages:
+            self.vistos.add(page["id"])
+            yield page
+
+    def finish(self) -> dict:
+        sumidos = [{"id": i, "archived": True} for i in self.snapshot.cards if i not in self.vistos]
+        self.snapshot._apply(self.delta, sumidos)
+        self.delta["primeira_analise"] = self.primeira
+        return self.delta
+
+
+# ---------- RELATÓRIO ----------
+def _conta(counter: Counter, trecho: str) -> int:
+    return sum(n for nome, n in counter.items() if trecho in normalize_title(nome))
+
+
+def gerar_insights(status_counts: Counter, tipo_counts: Counter, sem_tipo: int) -> list:
+    insights = []
+    em_criacao = _conta(status_counts, "em criacao")
+    aprovadas = _conta(status_counts, "aprovad")
+    if aprovadas and em_criacao < aprovadas:
+        insights.append("⚠️ Poucos cards em 'Em Criação'. Considere mover ideias aprovadas para esta etapa.")
+    if sem_tipo:
+        insights.append(f"📌 {sem_tipo} cards estão sem tipo de post definido.")
+    if not _conta(tipo_counts, "carrossel") and not _conta(tipo_counts, "foto"):
+        insights.append("🎨 Nenhum carrossel ou foto planejado. Considere diversificar os formatos de conteúdo.")
+    if not insights:
+        insights.append("✅ Kanban equilibrado: nenhum ponto de atenção encontrado.")
+    return insights
+
+
+def descrever_alteracoes(delta: dict) -> str:
+    if delta.get("primeira_analise"):
+        return f"Primeira análise: {len(delta['novos'])} card(s) registrados como base de comparação."
+    linhas = []
+    for c in delta["novos"]:
+        linhas.append(f"- 🆕 Novo card: {c['nome']} ({c['status'] or 'Sem Status'})")
+    for c in delta["movidos"]:
+        linhas.append(f"- 🔀 {c['nome']}: {c['de'] or 'Sem Status'} → {c['para'] or 'Sem Status'}")
+    for c in delta["arquivados"]:
+        linhas.append(f"- 🗄️ Arquivado: {c['nome']}")
+    return "\n".join(linhas) or "Nenhuma mudança significativa detectada."
+
+
+def gerar_relatorio_kanban(snapshot: KanbanSnapshot, delta: dict, hoje: Optional[str] = None) -> str:
+    status_counts, _ = snapshot.counts(missing="Sem Status")
+    _, tipo_post_counts = snapshot.counts(missing="Sem Tipo de post")
+    sem_tipo = tipo_post_counts.get("Sem Tipo de post", 0)
+    hoje = hoje or datetime.now().strftime("%d/%m/%Y")
 
     # Construção do relatório em markdown
     relatorio = f"""📊 **Relatório de Análise de Kanban - {hoje}**
 
 ### 🔍 Distribuição por Status:"""
 
-    for status, count in status_counts.items():
+    for status, count in status_counts.most_common():
         relatorio += f"\n- {status}: {count} card(s)"
 
     relatorio += "\n\n### 🧩 Distribuição por Tipo de Post:"
-    for tipo, count in tipo_post_counts.items():
+    for tipo, count in tipo_post_counts.most_common():
         relatorio += f"\n- {tipo}: {count} card(s)"
 
-    relatorio += f"\n\n### 🔁 Alterações detectadas desde a última análise:\n{alteracoes_detectadas}"
+    relatorio += f"\n\n### 🔁 Alterações detectadas desde a última análise:\n{descrever_alteracoes(delta)}"
 
     relatorio += "\n\n### 🧠 Insights Automáticos:"
-    for insight in insights:
+    for insight in gerar_insights(status_counts, tipo_post_counts, sem_tipo):
         relatorio += f"\n{insight}"
 
     return relatorio
 
-# Teste local (opcional)
+
+# Execução local: lista o Kanban inteiro, compara com o snapshot e grava o relatório
 if __name__ == "__main__":
-    print(gerar_relatorio_kanban())
+    from dotenv import load_dotenv
+    from notion_client import Client
+    from notion_client.helpers import iterate_paginated_api
+
+    load_dotenv()
+    notion = Client(auth=os.getenv("NOTION_TOKEN"))
+    database_id = os.getenv("NOTION_DATABASE_ID")
+
+    snapshot = KanbanSnapshot.load()
+    delta = snapshot.replace_all(iterate_paginated_api(notion.databases.query, database_id=database_id))
+    snapshot.save()
+
+    relatorio = gerar_relatorio_kanban(snapshot, delta)
+    with open(RELATORIO_FILE, "w", encoding="utf-8") as f:
+        f.write(relatorio)
+    print(relatorio)
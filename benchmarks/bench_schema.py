@@ -0,0 +1,97 @@
+"""
+Micro-benchmark: extração das propriedades do Conteúdo Planejado em 1.000 páginas sintéticas,
+cadeias de safe_get (implementação anterior das rotas) vs. content_schema.extract_content.
+
+    python -m benchmarks.bench_schema
+"""
+import random, timeit
+
+from content_schema import CONTENT_PLANNED, METRICAS, JANELAS, extract_content
+
+N_PAGES = 1000
+REPEAT = 5
+
+
+def safe_get(obj, path, default=None):
+    try:
+        for key in path:
+            obj = obj[key]
+        return obj
+    except (KeyError, TypeError, IndexError):
+        return default
+
+
+def extract_safe_get(props):
+    return {
+        "titulo": safe_get(props, ["📌 Título do Post", "title", 0, "plain_text"], "Sem título"),
+        "data_publicacao": safe_get(props, ["📆 Data de Publicação", "date", "start"]),
+        "status": safe_get(props, ["📋 Status", "rich_text", 0, "plain_text"]),
+        "tipo": safe_get(props, ["🎨 Tipo", "rich_text", 0, "plain_text"]),
+        "trafego_pago": safe_get(props, ["🚀 Tráfego Pago?", "select", "name"]),
+        "orcamento": safe_get(props, ["💰 Orçamento", "number"]),
+        "legenda": safe_get(props, ["✍️ Legenda / Copy", "rich_text", 0, "plain_text"]),
+        "plataformas": [tag["name"] for tag in safe_get(props, ["📱 Plataforma", "multi_select"], [])],
+        "feedback": safe_get(props, ["💬 Feedback / Observações", "rich_text", 0, "plain_text"]),
+        "engajamento": {
+            "curtidas_1h": safe_get(props, ["❤️ Curtidas (1h)", "number"]),
+            "curtidas_24h": safe_get(props, ["❤️ Curtidas (24h)", "number"]),
+            "curtidas_7d": safe_get(props, ["❤️ Curtidas (7d)", "number"]),
+            "comentarios_1h": safe_get(props, ["💬 Comentários (1h)", "number"]),
+            "comentarios_24h": safe_get(props, ["💬 Comentários (24h)", "number"]),
+            "comentarios_7d": safe_get(props, ["💬 Comentários (7d)", "number"]),
+            "compartilhamentos_1h": safe_get(props, ["🔁 Compartilhamentos (1h)", "number"]),
+            "compartilhamentos_24h": safe_get(props, ["🔁 Compartilhamentos (24h)", "number"]),
+            "compartilhamentos_7d": safe_get(props, ["🔁 Compartilhamentos (7d)", "number"]),
+            "salvamentos_1h": safe_get(props, ["💾 Salvamentos (1h)", "number"]),
+            "salvamentos_24h": safe_get(props, ["💾 Salvamentos (24h)", "number"]),
+            "salvamentos_7d": safe_get(props, ["💾 Salvamentos (7d)", "number"]),
+            "alcance_1h": safe_get(props, ["👀 Alcance (1h)", "number"]),
+            "alcance_24h": safe_get(props, ["👀 Alcance (24h)", "number"]),
+            "alcance_7d": safe_get(props, ["👀 Alcance (7d)", "number"]),
+            "engajamento_total": safe_get(props, ["📈 Engajamento total", "number"]),
+            "taxa_engajamento": safe_get(props, ["📊 Taxa de Engajamento", "number"]),
+        }
+    }
+
+
+def synthetic_page(rng: random.Random) -> dict:
+    """Página com a forma do Notion; ~20% dos campos vazios, como nos cards reais em andamento."""
+    def maybe(value):
+        return value if rng.random() > 0.2 else None
+
+    text = lambda s: [{"type": "text", "plain_text": s, "text": {"content": s}}] if maybe(s) else []
+    props = {
+        CONTENT_PLANNED["titulo"].prop: {"type": "title", "title": text("Post sintético")},
+        CONTENT_PLANNED["data_publicacao"].prop: {"type": "date", "date": maybe({"start": "2025-06-01"})},
+        CONTENT_PLANNED["status"].prop: {"type": "rich_text", "rich_text": text("Publicado")},
+        CONTENT_PLANNED["tipo"].prop: {"type": "rich_text", "rich_text": text("Reels")},
+        CONTENT_PLANNED["trafego_pago"].prop: {"type": "select", "select": maybe({"name": "Sim"})},
+        CONTENT_PLANNED["orcamento"].prop: {"type": "number", "number": maybe(rng.randint(0, 500))},
+        CONTENT_PLANNED["legenda"].prop: {"type": "rich_text", "rich_text": text("Legenda")},
+        CONTENT_PLANNED["plataformas"].prop: {"type": "multi_select", "multi_select": [{"name": "Instagram"}]},
+        CONTENT_PLANNED["feedback"].prop: {"type": "rich_text", "rich_text": text("ok")},
+        CONTENT_PLANNED["engajamento_total"].prop: {"type": "formula", "formula": {"type": "number", "number": rng.random() * 100}},
+        CONTENT_PLANNED["taxa_engajamento"].prop: {"type": "formula", "formula": {"type": "number", "number": rng.random()}},
+    }
+    for m in METRICAS:
+        for j in JANELAS:
+            props[CONTENT_PLANNED[f"{m}_{j}"].prop] = {"type": "number", "number": maybe(rng.randint(0, 1000))}
+    return props
+
+
+def main():
+    rng = random.Random(42)
+    pages = [synthetic_page(rng) for _ in range(N_PAGES)]
+
+    results = {}
+    for name, fn in (("safe_get", extract_safe_get), ("schema", extract_content)):
+        runs = timeit.repeat(lambda: [fn(p) for p in pages], number=1, repeat=REPEAT)
+        results[name] = min(runs)
+        print(f"{name:>9}: {results[name] * 1000:7.2f} ms / {N_PAGES} páginas "
+              f"({results[name] / N_PAGES * 1e6:.2f} µs por página)")
+
+    print(f"  speedup: {results['safe_get'] / results['schema']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Servidor local que imita as partes do Notion e do OpenAI usadas pelo main.app, para medir
+latência/throughput sem depender das APIs reais nem gastar rate limit.
+
+    python -m benchmarks.fake_upstream --port 8765 --latency 0.15 --jitter 0.05 --rate-429 0.02
+
+Notion em /v1 (search, databases/{id}, databases/{id}/query com cursor, pages, blocks/{id}/children,
+blocks/{id}); chat completions em /openai/v1/chat/completions (normal e stream, com usage) e /openai/v1/models.
+Aponte o app com NOTION_API_URL=http://127.0.0.1:8765/v1 e OPENAI_BASE_URL=http://127.0.0.1:8765/openai/v1.
+"""
+import argparse, asyncio, json, random, time, uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from content_schema import CONTENT_PLANNED, TITLE, RICH_TEXT, NUMBER, FORMULA_OR_NUMBER, SELECT, MULTI_SELECT, DATE
+
+# mesmos ids fixos do main.py
+KANBAN_DATABASE_ID = "2062b868-6ff2-81cf-b7f5-e379236da5cf"
+CONTENT_PLANNED_DATABASE_ID = "2062b8686ff281d890a9fd41641b56fb"
+
+STATUS = ["💡 Ideias para Post", "✅ Aprovadas", "🛠️ Em Criação", "📅 Agendado", "📢 Publicado"]
+TIPOS = ["🎞️ Reels", "🖼️ Carrossel", "📷 Foto", "📖 Story"]
+PLATAFORMAS = ["Instagram", "TikTok", "LinkedIn"]
+
+
+def _id(value: str) -> str:
+    return value.replace("-", "").lower()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _text(kind: str, value: str) -> dict:
+    return {"type": kind, kind: [{"type": "text", "plain_text": value, "text": {"content": value}}]}
+
+
+def _error(status: int, code: str, message: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse({"object": "error", "status": status, "code": code, "message": message},
+                        status_code=status, headers=headers)
+
+
+class Config:
+    def __init__(self, latency=0.1, jitter=0.03, rate_429=0.0, retry_after=1.0, max_rps=0.0,
+                 llm_latency=0.8, llm_tokens=120, pages=300, seed=42):
+        self.latency = latency          # latência média por chamada ao Notion (s)
+        self.jitter = jitter            # ± uniforme em torno da média
+        self.rate_429 = rate_429        # probabilidade de 429 aleatório
+        self.retry_after = retry_after  # Retry-After devolvido nos 429
+        self.max_rps = max_rps          # limite por segundo (0 = sem limite); estourou -> 429
+        self.llm_latency = llm_latency  # duração total de uma completion (s)
+        self.llm_tokens = llm_tokens    # tokens gerados por completion
+        self.pages = pages              # páginas por banco no início
+        self.seed = seed
+
+
+class FakeNotion:
+    """Estado em memória: bancos, páginas e blocos."""
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.schemas = {
+            _id(KANBAN_DATABASE_ID): self._kanban_schema(),
+            _id(CONTENT_PLANNED_DATABASE_ID): self._content_schema(),
+        }
+        self.pages = {}     # id -> página
+        self.order = {}     # database -> [ids], mais recente primeiro
+        self.blocks = {}    # page_id -> [blocos]
+        self.calls = []     # instantes das chamadas (janela de 1 s do max_rps)
+        start = datetime.now(timezone.utc) - timedelta(days=config.pages)
+        for db in self.schemas:
+            for i in range(config.pages):
+                created = (start + timedelta(days=i)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+                self._store(db, self._properties(db, i), created)
+
+    # ---------- DADOS SINTÉTICOS ----------
+    @staticmethod
+    def _select_options(names) -> dict:
+        return {"options": [{"id": f"opt{i}", "name": n, "color": "default"} for i, n in enumerate(names)]}
+
+    def _kanban_schema(self) -> dict:
+        return {
+            "Nome": {"id": "title", "type": TITLE, TITLE: {}},
+            "Status": {"id": "st", "type": SELECT, SELECT: self._select_options(STATUS)},
+            "Tipo de post": {"id": "tp", "type": SELECT, SELECT: self._select_options(TIPOS)},
+            "Data de postagem": {"id": "dt", "type": DATE, DATE: {}},
+            "Hashtags": {"id": "hs", "type": RICH_TEXT, RICH_TEXT: {}},
+        }
+
+    def _content_schema(self) -> dict:
+        schema = {}
+        for i, field in enumerate(CONTENT_PLANNED.values()):
+            kind = "formula" if field.kind == FORMULA_OR_NUMBER else field.kind
+            spec = {"id": "title" if kind == TITLE else f"c{i}", "type": kind, kind: {}}
+            if kind == SELECT:
+                spec[kind] = self._select_options(["Sim", "Não"])
+            elif kind == MULTI_SELECT:
+                spec[kind] = self._select_options(PLATAFORMAS)
+            schema[field.prop] = spec
+        return schema
+
+    def _properties(self, db: str, i: int) -> dict:
+        rng = self.rng
+        if db == _id(KANBAN_DATABASE_ID):
+            return {
+                "Nome": _text(TITLE, f"Ideia {i}: post sobre tema {rng.randint(1, 50)}"),
+                "Status": {"type": SELECT, SELECT: {"name": rng.choice(STATUS)}},
+                "Tipo de post": {"type": SELECT, SELECT: {"name": rng.choice(TIPOS)} if rng.random() > 0.1 else None},
+                "Data de postagem": {"type": DATE, DATE: {"start": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"}},
+                "Hashtags": _text(RICH_TEXT, "#marketing #conteudo"),
+            }
+        props = {}
+        for name, field in CONTENT_PLANNED.items():
+            if field.kind == TITLE:
+                props[field.prop] = _text(TITLE, f"Post {i}")
+            elif field.kind == RICH_TEXT:
+                props[field.prop] = _text(RICH_TEXT, {"tipo": rng.choice(TIPOS), "status": "Publicado"}.get(name, "Texto"))
+            elif field.kind == NUMBER:
+                props[field.prop] = {"type": NUMBER, NUMBER: rng.randint(0, 5000) if rng.random() > 0.2 else None}
+            elif field.kind == FORMULA_OR_NUMBER:
+                props[field.prop] = {"type": "formula", "formula": {"type": NUMBER, NUMBER: round(rng.random() * 100, 2)}}
+            elif field.kind == SELECT:
+                props[field.prop] = {"type": SELECT, SELECT: {"name": rng.choice(["Sim", "Não"])}}
+            elif field.kind == MULTI_SELECT:
+                props[field.prop] = {"type": MULTI_SELECT, MULTI_SELECT: [{"name": p} for p in rng.sample(PLATAFORMAS, 2)]}
+            elif field.kind == DATE:
+                props[field.prop] = {"type": DATE, DATE: {"start": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"}}
+        return props
+
+    def _store(self, db: str, properties: dict, created: Optional[str] = None) -> dict:
+        page_id = str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+        page = {
+            "object": "page", "id": page_id,
+            "created_time": created or _now(), "last_edited_time": created or _now(),
+            "archived": False, "in_trash": False,
+            "parent": {"type": "database_id", "database_id": str(uuid.UUID(db))},
+            "properties": properties,
+        }
+        self.pages[page_id] = page
+        self.order.setdefault(db, []).insert(0, page_id)
+        self.blocks[page_id] = [self._paragraph(f"Copy do post {page_id[:8]}")]
+        return page
+
+    def _paragraph(self, text: str) -> dict:
+        return {"object": "block", "id": str(uuid.uuid4()), "type": "paragraph", "archived": False,
+                "paragraph": {"rich_text": [{"type": "text", "plain_text": text, "text": {"content": text}}]}}
+
+    # ---------- LATÊNCIA E 429 ----------
+    async def delay(self) -> Optional[JSONResponse]:
+        cfg = self.config
+        now = time.monotonic()
+        if cfg.max_rps:
+            self.calls = [t for t in self.calls if now - t < 1.0]
+            if len(self.calls) >= cfg.max_rps:
+                return _error(429, "rate_limited", "max_rps", {"Retry-After": str(cfg.retry_after)})
+            self.calls.append(now)
+        if cfg.rate_429 and self.rng.random() < cfg.rate_429:
+            return _error(429, "rate_limited", "injetado", {"Retry-After": str(cfg.retry_after)})
+        await asyncio.sleep(max(0.0, cfg.latency + self.rng.uniform(-cfg.jitter, cfg.jitter)))
+        return None
+
+    # ---------- CONSULTA ----------
+    def _matches(self, page: dict, flt: Optional[dict]) -> bool:
+        if not flt:
+            return True
+        if "and" in flt:
+            return all(self._matches(page, f) for f in flt["and"])
+        if flt.get("timestamp") in ("last_edited_time", "created_time"):
+            field = flt["timestamp"]
+            return page[field] >= flt[field].get("on_or_after", "")
+        prop = page["properties"].get(flt.get("property"), {})
+        if "title" in flt:
+            return "".join(t["text"]["content"] for t in prop.get("title") or []) == flt["title"].get("equals")
+        if "select" in flt:
+            return ((prop.get("select") or {}).get("name")) == flt["select"].get("equals")
+        if "date" in flt:
+            start = (prop.get("date") or {}).get("start") or ""
+            cond = flt["date"]
+            return (not cond.get("on_or_after") or start >= cond["on_or_after"]) and \
+                   (not cond.get("on_or_before") or start <= cond["on_or_before"])
+        return True
+
+    def trim(self, page: dict, db: str, filter_properties) -> dict:
+        if not filter_properties:
+            return page
+        wanted = {name for name, spec in self.schemas[db].items() if spec["id"] in filter_properties}
+        return {**page, "properties": {k: v for k, v in page["properties"].items() if k in wanted}}
+
+    def query(self, db: str, body: dict, filter_properties) -> dict:
+        ids = [i for i in self.order.get(db, []) if not self.pages[i]["archived"]]
+        results = [self.pages[i] for i in ids if self._matches(self.pages[i], body.get("filter"))]
+        return self._paginate([self.trim(p, db, filter_properties) for p in results], body)
+
+    @staticmethod
+    def _paginate(items: list, params: dict) -> dict:
+        start = int(params.get("start_cursor") or 0)
+        size = min(int(params.get("page_size") or 100), 100)
+        nxt = start + size
+        return {"object": "list", "results": items[start:nxt],
+                "next_cursor": str(nxt) if nxt < len(items) else None, "has_more": nxt < len(items)}
+
+
+def create_app(config: Config) -> FastAPI:
+    app = FastAPI()
+    state = FakeNotion(config)
+    app.state.notion = state
+
+    @app.middleware("http")
+    async def latency(request: Request, call_next):
+        if request.url.path.startswith("/v1/"):
+            rejected = await state.delay()
+            if rejected is not None:
+                return rejected
+        return await call_next(request)
+
+    # ---------- NOTION ----------
+    @app.post("/v1/search")
+    async def search(request: Request):
+        body = await request.json()
+        query = (body.get("query") or "").lower()
+        results = [p for p in state.pages.values() if not p["archived"] and query in json.dumps(
+            p["properties"].get("Nome") or p["properties"].get(CONTENT_PLANNED["titulo"].prop), ensure_ascii=False).lower()]
+        return state._paginate(results, body)
+
+    @app.get("/v1/databases/{database_id}")
+    async def retrieve_database(database_id: str):
+        schema = state.schemas.get(_id(database_id))
+        if schema is None:
+            return _error(404, "object_not_found", "database")
+        return {"object": "database", "id": str(uuid.UUID(_id(database_id))), "properties": schema}
+
+    @app.post("/v1/databases/{database_id}/query")
+    async def query_database(database_id: str, request: Request):
+        if _id(database_id) not in state.schemas:
+            return _error(404, "object_not_found", "database")
+        body = await request.json() if await request.body() else {}
+        return state.query(_id(database_id), body, request.query_params.getlist("filter_properties"))
+
+    @app.post("/v1/pages")
+    async def create_page(request: Request):
+        body = await request.json()
+        db = _id(body["parent"]["database_id"])
+        if db not in state.schemas:
+            return _error(404, "object_not_found", "database")
+        page = state._store(db, body.get("properties", {}))
+        state.blocks[page["id"]] = [state._paragraph(c["paragraph"]["rich_text"][0]["text"]["content"])
+                                    for c in body.get("children", []) if c.get("type") == "paragraph"]
+        return page
+
+    @app.get("/v1/pages/{page_id}")
+    async def retrieve_page(page_id: str, request: Request):
+        page = state.pages.get(page_id)
+        if page is None:
+            return _error(404, "object_not_found", "page")
+        db = _id(page["parent"]["database_id"])
+        return state.trim(page, db, request.query_params.getlist("filter_properties"))
+
+    @app.patch("/v1/pages/{page_id}")
+    async def update_page(page_id: str, request: Request):
+        page = state.pages.get(page_id)
+        if page is None:
+            return _error(404, "object_not_found", "page")
+        body = await request.json()
+        for name, value in (body.get("properties") or {}).items():
+            page["properties"][name] = value
+        if "archived" in body:
+            page["archived"] = page["in_trash"] = bool(body["archived"])
+        page["last_edited_time"] = _now()
+        return page
+
+    @app.get("/v1/blocks/{block_id}/children")
+    async def list_children(block_id: str, request: Request):
+        blocks = [b for b in state.blocks.get(block_id, []) if not b["archived"]]
+        return state._paginate(blocks, dict(request.query_params))
+
+    @app.patch("/v1/blocks/{block_id}/children")
+    async def append_children(block_id: str, request: Request):
+        body = await request.json()
+        new = [state._paragraph(c["paragraph"]["rich_text"][0]["text"]["content"]) for c in body.get("children", [])]
+        state.blocks.setdefault(block_id, []).extend(new)
+        return {"object": "list", "results": new, "next_cursor": None, "has_more": False}
+
+    @app.patch("/v1/blocks/{block_id}")
+    async def update_block(block_id: str, request: Request):
+        body = await request.json()
+        for blocks in state.blocks.values():
+            for block in blocks:
+                if block["id"] == block_id:
+                    block.update(body)
+                    return block
+        return _error(404, "object_not_found", "block")
+
+    # ---------- OPENAI ----------
+    @app.get("/openai/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "gpt-4", "object": "model", "owned_by": "fake"}]}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        prompt_tokens = max(1, len(prompt) // 4)
+        words = [f"insight{i}" for i in range(config.llm_tokens)]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body.get("model")}
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.llm_latency)
+            return {**base, "object": "chat.completion", "usage": usage, "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": " ".join(words)},
+            }]}
+
+        async def chunks():
+            step = config.llm_latency / max(1, len(words))
+            for word in words:
+                await asyncio.sleep(step)
+                yield "data: " + json.dumps({**base, "object": "chat.completion.chunk", "choices": [{
+                    "index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}) + "\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield "data: " + json.dumps({**base, "object": "chat.completion.chunk",
+                                             "choices": [], "usage": usage}) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Notion/OpenAI falsos para benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.1, help="latência média do Notion (s)")
+    parser.add_argument("--jitter", type=float, default=0.03)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probabilidade de 429 por chamada")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--max-rps", type=float, default=0.0, help="limite do Notion por segundo (0 = sem)")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="duração de uma completion (s)")
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--pages", type=int, default=300, help="páginas por banco")
+    return parser.parse_args(argv)
+
+
+def config_from_args(args) -> Config:
+    return Config(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                  retry_after=args.retry_after, max_rps=args.max_rps,
+                  llm_latency=args.llm_latency, llm_tokens=args.llm_tokens, pages=args.pages)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
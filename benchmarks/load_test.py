@@ -0,0 +1,279 @@
+"""
+Teste de carga do main.app contra o Notion/OpenAI falsos (benchmarks/fake_upstream.py).
+Sobe os dois servidores (uvicorn, portas locais, diretório temporário com tokens.json próprio),
+dispara cada rota com concorrência fixa e imprime p50/p95/p99 e req/s por rota, além do tempo
+até o app responder, das fases do startup (app_startup_seconds) e da latência da 1ª chamada de cada rota.
+
+    python -m benchmarks.load_test --concurrency 8 --requests 100
+    python -m benchmarks.load_test --only recent,summary --latency 0.2 --rate-429 0.05
+    python -m benchmarks.load_test --json resultado.json      # para comparar antes/depois do deploy
+
+Por padrão o RateLimiter do app é aberto (--notion-rate 1000) para medir o app, não o limite do Notion;
+use --notion-rate 3 --max-rps 3 para reproduzir o comportamento de produção.
+"""
+import argparse, asyncio, itertools, json, math, os, socket, subprocess, sys, tempfile, time
+from typing import Callable, List, NamedTuple, Optional
+
+import httpx
+
+from benchmarks.fake_upstream import KANBAN_DATABASE_ID, CONTENT_PLANNED_DATABASE_ID, STATUS, TIPOS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    path: Callable[["Ids"], str]
+    body: Optional[Callable[["Ids"], object]] = None
+
+
+class Ids:
+    """Ids reais (do fake) distribuídos em rodízio entre as requisições."""
+
+    def __init__(self, kanban: List[dict], content: List[dict]):
+        self._kanban = itertools.cycle(kanban)
+        self._content = itertools.cycle(content)
+        self._counter = itertools.count()
+
+    def kanban(self) -> dict:
+        return next(self._kanban)
+
+    def content(self) -> dict:
+        return next(self._content)
+
+    def seq(self) -> int:
+        return next(self._counter)
+
+
+def _post(ids: Ids) -> dict:
+    n = ids.seq()
+    return {"Nome": f"Carga {n}", "Status": STATUS[0], "Tipo___de___post": TIPOS[n % len(TIPOS)],
+            "Data___de___postagem": "2025-07-01", "Hashtags": "#bench", "description": f"Copy {n}"}
+
+
+K, C = KANBAN_DATABASE_ID, CONTENT_PLANNED_DATABASE_ID
+
+# leituras primeiro; escritas depois; arquivamento por último (tira páginas do conjunto)
+SCENARIOS = [
+    Scenario("recent", "GET", lambda i: f"/notion/recent/{K}?limit=10"),
+    Scenario("recent_fields", "GET", lambda i: f"/notion/recent/{K}?limit=10&fields=nome,status"),
+    Scenario("summary", "GET", lambda i: f"/notion/summary/{K}"),
+    Scenario("content_planned", "GET", lambda i: "/notion/content-planned/x"),
+    Scenario("content_paid", "GET", lambda i: f"/notion/content-paid/{C}"),
+    Scenario("content_detail", "GET", lambda i: f"/notion/content/{i.content()['id']}?fields=titulo,engajamento"),
+    Scenario("engagement", "GET", lambda i: "/notion/analytics/engagement"),
+    Scenario("analyze_kanban", "GET", lambda i: "/analyze-kanban"),
+    Scenario("resolve_title", "POST", lambda i: "/notion/pages/resolve-title",
+             lambda i: {"title": i.kanban()["nome"]}),
+    Scenario("insight_post", "GET", lambda i: f"/notion/insight/{i.content()['id']}"),
+    Scenario("insight_post_llm", "GET", lambda i: f"/notion/insight/{i.content()['id']}?refresh=true"),
+    Scenario("insight_stream", "GET", lambda i: f"/notion/insight/{i.content()['id']}?refresh=true&stream=true"),
+    Scenario("insight_history", "GET", lambda i: "/notion/insight/history"),
+    Scenario("insight_batch", "POST", lambda i: "/notion/insight/batch",
+             lambda i: {"page_ids": [i.content()["id"] for _ in range(5)]}),
+    Scenario("routes", "GET", lambda i: "/routes"),
+    Scenario("metrics", "GET", lambda i: "/metrics"),
+    Scenario("llm_cache_stats", "GET", lambda i: "/admin/llm-cache"),
+    Scenario("create_post", "POST", lambda i: "/notion/create-post", _post),
+    Scenario("create_posts_x5", "POST", lambda i: "/notion/create-posts", lambda i: [_post(i) for _ in range(5)]),
+    Scenario("create_idea", "POST", lambda i: "/create-idea",
+             lambda i: {"nome": f"Ideia carga {i.seq()}", "tipo": TIPOS[0], "data_postagem": "2025-07-02"}),
+    Scenario("update_post", "PATCH", lambda i: f"/notion/post/{i.kanban()['id']}",
+             lambda i: {"Nome": f"Editado {i.seq()}", "Status": STATUS[1], "Tipo___de___post": TIPOS[1],
+                        "Hashtags": "#bench", "Data___de___postagem": "2025-07-03"}),
+    Scenario("update_status", "PATCH", lambda i: f"/notion/post/{i.kanban()['id']}/status",
+             lambda i: {"status": STATUS[i.seq() % len(STATUS)]}),
+    Scenario("update_content", "PATCH", lambda i: f"/notion/post/{i.kanban()['id']}/content",
+             lambda i: {"description": f"Nova copy {i.seq()}\n\nSegundo parágrafo"}),
+    Scenario("delete_post", "DELETE", lambda i: f"/notion/post/{i.kanban()['id']}"),
+]
+
+
+# ---------- PROCESSOS ----------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} não respondeu em {timeout}s")
+
+
+def start_servers(args, workdir: str):
+    fake_port, app_port = free_port(), free_port()
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_upstream", "--port", str(fake_port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter), "--rate-429", str(args.rate_429),
+        "--retry-after", str(args.retry_after), "--max-rps", str(args.max_rps),
+        "--llm-latency", str(args.llm_latency), "--pages", str(args.pages),
+    ], cwd=ROOT)
+
+    with open(os.path.join(workdir, "tokens.json"), "w") as f:
+        json.dump({"bench": {"access_token": "secret_bench", "workspace_name": "bench"}}, f)
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "NOTION_API_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/openai/v1",
+        "OPENAI_API_KEY": "sk-bench",
+        "NOTION_DATABASE_ID": KANBAN_DATABASE_ID,
+        "NOTION_RATE_LIMIT": str(args.notion_rate),
+        "NOTION_RATE_BURST": str(max(3, int(args.notion_rate))),
+        "REPLICA_ENABLED": "1" if args.replica else "0",
+        "REPLICA_PATH": os.path.join(workdir, "replica.db"),
+    }
+    wait_ready(f"http://127.0.0.1:{fake_port}/docs")
+
+    spawned = time.perf_counter()
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--log-level", "warning",
+    ], cwd=workdir, env=env)
+    wait_ready(f"http://127.0.0.1:{app_port}/routes")
+    return fake, app, f"http://127.0.0.1:{app_port}", time.perf_counter() - spawned
+
+
+def startup_report(base_url: str, ready: float) -> dict:
+    """Tempo até o app responder + fases medidas pelo próprio app (/metrics)."""
+    phases = {}
+    for line in httpx.get(f"{base_url}/metrics").text.splitlines():
+        if line.startswith("app_startup_seconds{"):
+            labels, value = line.rsplit(" ", 1)
+            phases[labels.split('"')[1]] = float(value)
+    print(f"startup: pronto em {ready:.2f}s  " +
+          "  ".join(f"{phase} {seconds:.2f}s" for phase, seconds in phases.items()))
+    return {"ready_s": ready, **phases}
+
+
+# ---------- CARGA ----------
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank."""
+    if not sorted_values:
+        return math.nan
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, ids: Ids,
+                       requests: int, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    todo = iter(range(requests))
+
+    async def worker():
+        for _ in todo:
+            kwargs = {"json": scenario.body(ids)} if scenario.body else {}
+            start = time.perf_counter()
+            try:
+                resp = await client.request(scenario.method, scenario.path(ids), **kwargs)
+                await resp.aread()
+                status = str(resp.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    ok = sum(n for s, n in statuses.items() if s.startswith("2") or s == "304")
+    return {
+        "route": scenario.name,
+        "requests": requests,
+        "ok": ok,
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "req_s": requests / wall if wall else math.nan,
+    }
+
+
+async def load_ids(client: httpx.AsyncClient) -> Ids:
+    kanban = (await client.get(f"/notion/recent/{K}?limit=50&fields=nome")).json()
+    content = (await client.get("/notion/content-planned/x?fields=titulo")).json()
+    return Ids(kanban, content)
+
+
+async def run(args, base_url: str) -> List[dict]:
+    selected = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        ids = await load_ids(client)
+        results = []
+        for scenario in selected:
+            # 1ª chamada separada: mostra o custo de aquecimento (imports, conexões, caches frios)
+            first = await run_scenario(client, scenario, ids, 1, 1)
+            if args.warmup:
+                await run_scenario(client, scenario, ids, args.warmup, 1)
+            result = await run_scenario(client, scenario, ids, args.requests, args.concurrency)
+            result["first_ms"] = first["p50_ms"]
+            print_row(result)
+            results.append(result)
+        return results
+
+
+def print_header():
+    print(f"{'rota':<22}{'ok':>9}{'1ª ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}  status")
+
+
+def print_row(r: dict):
+    statuses = " ".join(f"{k}:{v}" for k, v in sorted(r["statuses"].items()))
+    print(f"{r['route']:<22}{r['ok']:>5}/{r['requests']:<3}{r['first_ms']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+          f"{r['p99_ms']:>10.1f}{r['req_s']:>9.1f}  {statuses}", flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do main.app com upstream falso")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="requisições por rota")
+    parser.add_argument("--warmup", type=int, default=3, help="requisições descartadas por rota")
+    parser.add_argument("--only", type=lambda s: set(s.split(",")), default=None,
+                        help=f"rotas separadas por vírgula ({', '.join(s.name for s in SCENARIOS)})")
+    parser.add_argument("--latency", type=float, default=0.1, help="latência média do Notion falso (s)")
+    parser.add_argument("--jitter", type=float, default=0.03)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--max-rps", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--notion-rate", type=float, default=1000.0, help="NOTION_RATE_LIMIT do app")
+    parser.add_argument("--no-replica", dest="replica", action="store_false", help="sobe o app com REPLICA_ENABLED=0")
+    parser.add_argument("--startup-wait", type=float, default=0.0,
+                        help="segundos de espera após o app subir (0 = medir a 1ª chamada ainda durante o warm-up)")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as workdir:
+        fake, app, base_url, ready = start_servers(args, workdir)
+        try:
+            if args.startup_wait:
+                # deixa o warm-up em segundo plano terminar antes de medir
+                time.sleep(args.startup_wait)
+            startup = startup_report(base_url, ready)
+            print_header()
+            results = asyncio.run(run(args, base_url))
+        finally:
+            for proc in (app, fake):
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: (sorted(v) if isinstance(v, set) else v) for k, v in vars(args).items()},
+                       "startup": startup, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import re, asyncio
+from typing import List, NamedTuple, Optional, Tuple
+
+from notion_api import NotionError
+
+
+class BlockPlan(NamedTuple):
+    kept: List[str]                    # ids que ficam como estão
+    update: List[Tuple[str, str]]      # (block_id, novo texto)
+    archive: List[str]                 # ids a arquivar
+    append: List[str]                  # textos de novos parágrafos, no fim da página
+
+
+def split_paragraphs(description: str) -> List[str]:
+    """Uma linha em branco separa parágrafos (mesma regra do Notion ao colar texto)."""
+    return [p.strip() for p in re.split(r"\n\s*\n", description.strip()) if p.strip()]
+
+
+def paragraph_text(block: dict) -> str:
+    rich_text = (block.get("paragraph") or {}).get("rich_text") or []
+    return "".join(
+        rt.get("plain_text") or (rt.get("text") or {}).get("content", "")
+        for rt in rich_text
+    )
+
+
+def plan_paragraphs(children: List[dict], paragraphs: List[str]) -> BlockPlan:
+    """
+    Compara os blocos atuais da página com os parágrafos desejados, posição a posição.
+    Blocos que não são parágrafo saem (a página guarda só a copy); parágrafos iguais ficam,
+    diferentes são editados no lugar, sobras são arquivadas e o excedente é anexado no fim.
+    """
+    archive = [b["id"] for b in children if b.get("type") != "paragraph"]
+    existing = [b for b in children if b.get("type") == "paragraph"]
+
+    # mesmo texto com outra divisão em blocos (ex.: cards antigos, criados com a copy num bloco só): nada a escrever
+    current = split_paragraphs("\n\n".join(paragraph_text(b) for b in existing))
+    if current == paragraphs:
+        return BlockPlan([b["id"] for b in existing], [], archive, [])
+
+    kept, update = [], []
+    for block, text in zip(existing, paragraphs):
+        if paragraph_text(block) == text:
+            kept.append(block["id"])
+        else:
+            update.append((block["id"], text))
+
+    archive += [b["id"] for b in existing[len(paragraphs):]]
+    append = paragraphs[len(existing):]
+    return BlockPlan(kept, update, archive, append)
+
+
+def paragraph_block(text: str) -> dict:
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [{
+                "type": "text",
+                "text": {"content": text}
+            }]
+        }
+    }
+
+
+def paragraph_blocks(description: str) -> List[dict]:
+    """Blocos da copy na criação da página: um parágrafo por trecho, a mesma divisão que o diff usa."""
+    return [paragraph_block(text) for text in split_paragraphs(description)]
+
+
+async def sync_paragraphs(notion, page_id: str, token: str, description: str,
+                          replace: bool = False, priority: Optional[int] = None) -> BlockPlan:
+    """
+    Leva a copy da página para `description`: lê os blocos filhos (paginado), planeja e dispara
+    as escritas em paralelo (o RateLimiter do cliente segura o ritmo). Os anexos (lotes de 100 blocos)
+    saem um depois do outro, para os parágrafos chegarem na ordem. `replace` arquiva tudo e reescreve.
+    Erro do Notion vira NotionError.
+    """
+    children = []
+    async for batch in notion.paginate("GET", f"/blocks/{page_id}/children", token, priority=priority):
+        children.extend(batch)
+
+    if replace:
+        plan = BlockPlan([], [], [b["id"] for b in children], split_paragraphs(description))
+    else:
+        plan = plan_paragraphs(children, split_paragraphs(description))
+
+    calls = [
+        notion.patch(f"/blocks/{block_id}", token, json={"archived": True}, priority=priority)
+        for block_id in plan.archive
+    ] + [
+        notion.patch(f"/blocks/{block_id}", token, json={"paragraph": paragraph_block(text)["paragraph"]},
+                     priority=priority)
+        for block_id, text in plan.update
+    ]
+
+    async def append():
+        for i in range(0, len(plan.append), 100):
+            resp = await notion.patch(
+                f"/blocks/{page_id}/children", token,
+                json={"children": [paragraph_block(text) for text in plan.append[i:i + 100]]},
+                priority=priority,
+            )
+            if not resp.is_success:
+                raise NotionError(resp.status_code, resp.text)
+
+    responses = await asyncio.gather(append(), *calls)
+    for resp in responses[1:]:
+        if not resp.is_success:
+            raise NotionError(resp.status_code, resp.text)
+    return plan
@@ -0,0 +1,207 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Union
+
+# tipos de propriedade do Notion suportados
+TITLE = "title"
+RICH_TEXT = "rich_text"
+NUMBER = "number"
+FORMULA_OR_NUMBER = "formula_or_number"
+SELECT = "select"
+MULTI_SELECT = "multi_select"
+DATE = "date"
+
+
+class Field(NamedTuple):
+    prop: str
+    kind: str
+    default: Any = None
+
+    def or_default(self, default) -> "Field":
+        return self._replace(default=default)
+
+
+# ---------- BANCO "CONTEÚDO PLANEJADO" ----------
+CONTENT_PLANNED = {
+    "titulo": Field("📌 Título do Post", TITLE, "Sem título"),
+    "data_publicacao": Field("📆 Data de Publicação", DATE),
+    "status": Field("📋 Status", RICH_TEXT),
+    "tipo": Field("🎨 Tipo", RICH_TEXT),
+    "trafego_pago": Field("🚀 Tráfego Pago?", SELECT),
+    "orcamento": Field("💰 Orçamento", NUMBER),
+    "legenda": Field("✍️ Legenda / Copy", RICH_TEXT),
+    "plataformas": Field("📱 Plataforma", MULTI_SELECT, []),
+    "feedback": Field("💬 Feedback / Observações", RICH_TEXT),
+    "curtidas_1h": Field("❤️ Curtidas (1h)", NUMBER),
+    "curtidas_24h": Field("❤️ Curtidas (24h)", NUMBER),
+    "curtidas_7d": Field("❤️ Curtidas (7d)", NUMBER),
+    "comentarios_1h": Field("💬 Comentários (1h)", NUMBER),
+    "comentarios_24h": Field("💬 Comentários (24h)", NUMBER),
+    "comentarios_7d": Field("💬 Comentários (7d)", NUMBER),
+    "compartilhamentos_1h": Field("🔁 Compartilhamentos (1h)", NUMBER),
+    "compartilhamentos_24h": Field("🔁 Compartilhamentos (24h)", NUMBER),
+    "compartilhamentos_7d": Field("🔁 Compartilhamentos (7d)", NUMBER),
+    "salvamentos_1h": Field("💾 Salvamentos (1h)", NUMBER),
+    "salvamentos_24h": Field("💾 Salvamentos (24h)", NUMBER),
+    "salvamentos_7d": Field("💾 Salvamentos (7d)", NUMBER),
+    "alcance_1h": Field("👀 Alcance (1h)", NUMBER),
+    "alcance_24h": Field("👀 Alcance (24h)", NUMBER),
+    "alcance_7d": Field("👀 Alcance (7d)", NUMBER),
+    "engajamento_total": Field("📈 Engajamento total", FORMULA_OR_NUMBER),
+    "taxa_engajamento": Field("📊 Taxa de Engajamento", FORMULA_OR_NUMBER),
+}
+
+# ---------- BANCO KANBAN (/notion/recent) ----------
+KANBAN = {
+    "nome": Field("Nome", TITLE, "Sem título"),
+    "status": Field("Status", SELECT, "Não definido"),
+    "tipo": Field("Tipo de post", SELECT, "Não definido"),
+    "data_postagem": Field("Data de postagem", DATE),
+}
+
+METRICAS = ("curtidas", "comentarios", "compartilhamentos", "salvamentos", "alcance")
+JANELAS = ("1h", "24h", "7d")
+
+
+# ---------- LEITORES POR TIPO ----------
+# recebem o objeto da propriedade (dict) e devolvem o valor ou None; nada de exceções no caminho feliz
+def _first_plain_text(kind: str) -> Callable[[dict], Any]:
+    def read(prop):
+        items = prop.get(kind)
+        return items[0].get("plain_text") if items else None
+    return read
+
+
+def _number(prop):
+    return prop.get("number")
+
+
+def _formula_or_number(prop):
+    formula = prop.get("formula")
+    if formula:
+        return formula.get("number")
+    return prop.get("number")
+
+
+def _select(prop):
+    select = prop.get("select")
+    return select.get("name") if select else None
+
+
+def _multi_select(prop):
+    items = prop.get("multi_select")
+    return [tag["name"] for tag in items if "name" in tag] if items else None
+
+
+def _date(prop):
+    date = prop.get("date")
+    return date.get("start") if date else None
+
+
+READERS = {
+    TITLE: _first_plain_text(TITLE),
+    RICH_TEXT: _first_plain_text(RICH_TEXT),
+    NUMBER: _number,
+    FORMULA_OR_NUMBER: _formula_or_number,
+    SELECT: _select,
+    MULTI_SELECT: _multi_select,
+    DATE: _date,
+}
+
+Layout = Dict[str, Union[Field, "Layout"]]
+
+
+def compile_extractor(layout: Layout) -> Callable[[dict], dict]:
+    """
+    Transforma um layout {campo_de_saída: Field | sub-layout} numa função props -> dict.
+    A resolução de leitores e defaults acontece aqui, uma vez; por página sobra só um laço.
+    """
+    steps = []
+    for key, spec in layout.items():
+        if isinstance(spec, Field):
+            steps.append((key, spec.prop, READERS[spec.kind], spec.default, None))
+        else:
+            steps.append((key, None, None, None, compile_extractor(spec)))
+
+    def extract(props: dict) -> dict:
+        out = {}
+        for key, prop_name, read, default, nested in steps:
+            if nested is not None:
+                out[key] = nested(props)
+                continue
+            prop = props.get(prop_name)
+            value = read(prop) if prop else None
+            if value is None:
+                # listas default não podem ser compartilhadas entre páginas
+                value = list(default) if isinstance(default, list) else default
+            out[key] = value
+        return out
+
+    return extract
+
+
+def pick(*names, **overrides) -> Layout:
+    """Sub-layout do CONTENT_PLANNED com os campos pedidos (e defaults trocados via kwargs)."""
+    layout = {name: CONTENT_PLANNED[name] for name in names}
+    for name, default in overrides.items():
+        layout[name] = CONTENT_PLANNED[name].or_default(default)
+    return layout
+
+
+ENGAJAMENTO = pick(*(f"{m}_{j}" for m in METRICAS for j in JANELAS), "engajamento_total", "taxa_engajamento")
+
+# /notion/content-planned e /notion/content-paid
+CONTENT_LAYOUT = {
+    **pick("titulo", "data_publicacao", "status", "tipo", "trafego_pago", "orcamento",
+           "legenda", "plataformas", "feedback"),
+    "engajamento": ENGAJAMENTO,
+}
+extract_content = compile_extractor(CONTENT_LAYOUT)
+
+# /notion/recent
+extract_recent = compile_extractor(KANBAN)
+
+# /notion/insight/history
+extract_history = compile_extractor(
+    pick("titulo", "tipo", "trafego_pago", orcamento=0, taxa_engajamento=0, engajamento_total=0)
+)
+
+# /notion/insight/{page_id}
+extract_post_insight = compile_extractor(
+    pick("titulo", "tipo", "data_publicacao", "trafego_pago", "orcamento", "plataformas",
+         *(f"{m}_7d" for m in METRICAS), taxa_engajamento=0)
+)
+
+
+# ---------- CAMPOS ESPARSOS (?fields=) ----------
+LAYOUTS = {"content": CONTENT_LAYOUT, "recent": KANBAN}
+
+
+def layout_props(layout: Layout) -> Tuple[str, ...]:
+    """Propriedades do Notion lidas por um layout (para o filter_properties)."""
+    props = []
+    for spec in layout.values():
+        props.extend([spec.prop] if isinstance(spec, Field) else layout_props(spec))
+    return tuple(props)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """"titulo, data_publicacao" -> ("titulo", "data_publicacao"); vazio -> None (todos os campos)."""
+    if not fields:
+        return None
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    return names or None
+
+
+@lru_cache(maxsize=128)
+def sparse_extractor(layout_name: str, fields: Optional[Tuple[str, ...]]) -> Tuple[Callable[[dict], dict], Tuple[str, ...]]:
+    """
+    Extrator compilado só com os campos pedidos (na ordem do layout) e as propriedades que ele lê.
+    Campo desconhecido -> ValueError.
+    """
+    layout = LAYOUTS[layout_name]
+    if fields is not None:
+        unknown = [f for f in fields if f not in layout]
+        if unknown:
+            raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}. Disponíveis: {', '.join(layout)}")
+        layout = {name: spec for name, spec in layout.items() if name in fields}
+    return compile_extractor(layout), layout_props(layout)
@@ -0,0 +1,142 @@
+import time, threading
+from typing import Dict, List, Optional
+
+from notion_api import NotionAPI, NotionError
+from replica import normalize_id
+
+# tipos cujo valor é escolhido de uma lista de opções (o Notion cria a opção sozinho se ela não existir)
+OPTION_TYPES = ("select", "multi_select", "status")
+
+
+class SchemaError(ValueError):
+    """Propriedades que não batem com o schema do banco (lista de mensagens em `errors`)."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class DatabaseSchema:
+    """Nomes, ids, tipos e opções das propriedades de um banco (resposta de GET /databases/{id})."""
+
+    def __init__(self, database_id: str, properties: dict):
+        self.database_id = database_id
+        self.fetched_at = time.monotonic()
+        self.ids: Dict[str, str] = {}
+        self.types: Dict[str, str] = {}
+        self.options: Dict[str, List[str]] = {}
+        for name, prop in properties.items():
+            kind = prop.get("type")
+            self.types[name] = kind
+            if prop.get("id"):
+                self.ids[name] = prop["id"]
+            if kind in OPTION_TYPES:
+                self.options[name] = [o["name"] for o in (prop.get(kind) or {}).get("options", [])]
+        self._allowed = {name: frozenset(opts) for name, opts in self.options.items()}
+
+    def property_ids(self, names) -> Optional[List[str]]:
+        """Ids na ordem pedida; None se algum nome não existir no banco."""
+        if any(name not in self.ids for name in names):
+            return None
+        return [self.ids[name] for name in names]
+
+    def validate(self, props: dict) -> List[str]:
+        """
+        Confere o corpo `properties` de um POST/PATCH /pages: propriedade existe, tem o tipo usado
+        no corpo e, para select/multi_select/status, a opção já existe. Valores vazios passam.
+        """
+        errors = []
+        for name, value in props.items():
+            kind = self.types.get(name)
+            if kind is None:
+                errors.append(f"Propriedade desconhecida: '{name}'")
+                continue
+            if not isinstance(value, dict) or kind not in value:
+                errors.append(f"'{name}' é do tipo {kind}")
+                continue
+            if kind not in OPTION_TYPES or not value[kind]:
+                continue
+            chosen = value[kind] if kind == "multi_select" else [value[kind]]
+            for option in chosen:
+                option = (option or {}).get("name")
+                if option and option not in self._allowed[name]:
+                    validas = ", ".join(f"'{o}'" for o in self.options[name])
+                    errors.append(f"Opção inválida para '{name}': '{option}' (válidas: {validas})")
+        return errors
+
+    def describe(self) -> dict:
+        return {
+            "database_id": self.database_id,
+            "properties": {
+                name: {"type": kind, **({"options": self.options[name]} if name in self.options else {})}
+                for name, kind in self.types.items()
+            },
+        }
+
+
+class SchemaCache:
+    """
+    Schema por banco com TTL. Se uma opção não existir, o schema é buscado de novo (no máximo a cada
+    `recheck_after` segundos) antes de rejeitar: cobre opção criada agora há pouco no Notion.
+    Chamadas simultâneas ao mesmo banco viram um GET só (single-flight do NotionAPI).
+    """
+
+    def __init__(self, notion: NotionAPI, ttl: float = 300, recheck_after: float = 10):
+        self.notion = notion
+        self.ttl = ttl
+        self.recheck_after = recheck_after
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._schemas: Dict[str, DatabaseSchema] = {}
+
+    def cached(self, database_id: str) -> Optional[DatabaseSchema]:
+        with self._lock:
+            schema = self._schemas.get(normalize_id(database_id))
+        if schema is None or time.monotonic() - schema.fetched_at > self.ttl:
+            return None
+        return schema
+
+    async def get(self, database_id: str, token: str, priority: Optional[int] = None) -> DatabaseSchema:
+        schema = self.cached(database_id)
+        if schema is not None:
+            self.hits += 1
+            return schema
+        self.misses += 1
+        resp = await self.notion.get(f"/databases/{database_id}", token, priority=priority)
+        if not resp.is_success:
+            raise NotionError(resp.status_code, resp.text)
+        schema = DatabaseSchema(database_id, resp.json().get("properties", {}))
+        with self._lock:
+            self._schemas[normalize_id(database_id)] = schema
+        return schema
+
+    async def validate(self, database_id: str, token: str, props: dict, priority: Optional[int] = None):
+        """Levanta SchemaError com todas as violações; nenhuma chamada ao Notion se o schema estiver em cache."""
+        schema = await self.get(database_id, token, priority)
+        errors = schema.validate(props)
+        if errors and time.monotonic() - schema.fetched_at > self.recheck_after:
+            self.invalidate(database_id)
+            errors = (await self.get(database_id, token, priority)).validate(props)
+        if errors:
+            raise SchemaError(errors)
+
+    def invalidate(self, database_id: Optional[str] = None):
+        with self._lock:
+            if database_id is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(normalize_id(database_id), None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        with self._lock:
+            now = time.monotonic()
+            ages = {key: round(now - s.fetched_at, 1) for key, s in self._schemas.items()}
+        return {
+            "databases": ages,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "ttl": self.ttl,
+        }
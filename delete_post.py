@@ -2,20 +2,21 @@ import json
 import os
 from dotenv import load_dotenv
 from notion_client import Client
+from notion_client.helpers import iterate_paginated_api
+
+from title_index import TitleIndex
 
 load_dotenv()
 notion = Client(auth=os.getenv("NOTION_TOKEN"))
 database_id = os.getenv("NOTION_DATABASE_ID")
 
 def buscar_id_por_titulo(titulo):
-    query = notion.databases.query(database_id=database_id)
-    for resultado in query.get("results"):
-        props = resultado["properties"]
-        if props.get("Nome", {}).get("title"):
-            nome = props["Nome"]["title"][0]["text"]["content"]
-            if nome == titulo:
-                return resultado["id"]
-    return None
+    # percorre todas as páginas da base (não só a primeira) e compara sem acentos/maiúsculas
+    indice = TitleIndex.from_pages(iterate_paginated_api(notion.databases.query, database_id=database_id))
+    encontrados = indice.lookup(titulo)
+    if len(encontrados) > 1:
+        print(f"⚠️ {len(encontrados)} cards com esse título; usando o editado mais recentemente.")
+    return encontrados[0]["page_id"] if encontrados else None
 
 def main():
     json_input = input("🗑️ Cole o JSON da exclusão:\n").strip()
@@ -0,0 +1,54 @@
+import hashlib, threading
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def etag_for(body: bytes, *scope) -> str:
+    """
+    ETag forte: hash do corpo já renderizado (mais a rota/parâmetros).
+    Não depende do last_edited_time do Notion, que é arredondado para o minuto.
+    """
+    h = hashlib.sha1(repr(scope).encode())
+    h.update(body)
+    return f'"{h.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+class ETagMemo:
+    """
+    Último ETag emitido por rota/parâmetros junto com a versão da réplica que o gerou.
+    Se a versão não mudou, o ETag ainda vale e o 304 sai sem ler página nenhuma.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def get(self, key: tuple, version) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: tuple, version, etag: str):
+        with self._lock:
+            self._entries[key] = (version, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,38 @@
+from collections import Counter
+from typing import Iterable
+
+INDEFINIDO = "Indefinido"
+
+
+def _select_name(props: dict, name: str) -> str:
+    select = (props.get(name) or {}).get("select") or {}
+    return select.get("name") or INDEFINIDO
+
+
+class KanbanSummary:
+    """
+    Contagem incremental por Status e Tipo de post.
+    Consome as páginas à medida que chegam, sem guardar os resultados em memória.
+    """
+
+    def __init__(self):
+        self.status = Counter()
+        self.tipo = Counter()
+        self.total = 0
+
+    def add(self, page: dict):
+        props = page.get("properties", {})
+        self.status[_select_name(props, "Status")] += 1
+        self.tipo[_select_name(props, "Tipo de post")] += 1
+        self.total += 1
+
+    def add_pages(self, pages: Iterable[dict]):
+        for page in pages:
+            self.add(page)
+
+    def as_dict(self) -> dict:
+        return {
+            "status_summary": dict(self.status),
+            "type_summary": dict(self.tipo),
+        }
+
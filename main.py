@@ -1,39 +1,387 @@
-import os, json, requests
+import os, json, time, signal, asyncio, logging, functools, threading
+IMPORT_STARTED = time.perf_counter()
+from contextlib import asynccontextmanager
 from typing import Optional, List
-from fastapi import FastAPI, HTTPException, Path, Query
+
+import httpx
+from fastapi import FastAPI, HTTPException, Path, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
-NOTION_VERSION = "2022-06-28"
+from notion_api import NotionAPI, NotionError, NOTION_API_URL
+from rate_limiter import RateLimiter, WRITE, BULK
+from kanban_summary import KanbanSummary
+from replica import Replica, ReplicaSync
+from title_index import TitleIndex
+from block_diff import paragraph_blocks, sync_paragraphs
+from content_schema import (CONTENT_PLANNED, extract_history, extract_post_insight,
+                            parse_fields, sparse_extractor)
+from llm_cache import LLMCache, cache_key
+from analyze_graphs import KanbanSnapshot, SNAPSHOT_FILE, gerar_relatorio_kanban
+from token_store import TokenStore
+from db_schema import SchemaCache, SchemaError
+from outbox import Outbox, OutboxWorker
+from write_coalescer import PatchCoalescer
+from workspaces import (Current, Workspace, WorkspaceMiddleware, WorkspacePool,
+                        current_workspace, use_workspace)
+from metrics import Registry, MetricsMiddleware
+from etag import ETagMemo, etag_for, etag_matches, not_modified
+
+try:
+    # orjson serializa as listagens grandes bem mais rápido; sem ele, json padrão
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+log = logging.getLogger("uvicorn.error")
+
 TOKENS_FILE = "tokens.json"
 DATABASE_ID_ENV = "NOTION_DATABASE_ID"
 CONTENT_PLANNED_DATABASE_ID = "2062b8686ff281d890a9fd41641b56fb"
 KANBAN_DATABASE_ID = "2062b868-6ff2-81cf-b7f5-e379236da5cf"
+WORKSPACE_ID_ENV = "NOTION_WORKSPACE_ID"
+
+# réplica local (SQLite) do Kanban e do Conteúdo Planejado
+REPLICA_ENABLED = os.getenv("REPLICA_ENABLED", "1") != "0"
+REPLICA_PATH = os.getenv("REPLICA_PATH", "notion_replica.db")
+REPLICA_SYNC_INTERVAL = float(os.getenv("REPLICA_SYNC_INTERVAL", "30"))
+REPLICA_MAX_STALENESS = float(os.getenv("REPLICA_MAX_STALENESS", "120"))
+
+# limite do Notion (~3 req/s por integração) aplicado por workspace: cada token tem sua própria cota
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))
+NOTION_RATE_BURST = int(os.getenv("NOTION_RATE_BURST", "3"))
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "4"))
+
+# criação em lote: o Notion aceita ~3 req/s por integração
+BULK_CREATE_CONCURRENCY = int(os.getenv("BULK_CREATE_CONCURRENCY", "3"))
+BULK_CREATE_MAX_ITEMS = int(os.getenv("BULK_CREATE_MAX_ITEMS", "100"))
+
+# LLM dos insights + cache de respostas (LLM_CACHE_PATH liga a persistência em disco)
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+# startup: openai/pandas carregados em segundo plano e conexão com o OpenAI aberta antes do 1º insight
+OPENAI_PREWARM = os.getenv("OPENAI_PREWARM", "1") != "0"
+PRELOAD_ANALYTICS = os.getenv("PRELOAD_ANALYTICS", "1") != "0"
+
+# insights em lote
+INSIGHT_BATCH_CONCURRENCY = int(os.getenv("INSIGHT_BATCH_CONCURRENCY", "4"))
+INSIGHT_BATCH_MAX_CONCURRENCY = int(os.getenv("INSIGHT_BATCH_MAX_CONCURRENCY", "16"))
+INSIGHT_BATCH_MAX_ITEMS = int(os.getenv("INSIGHT_BATCH_MAX_ITEMS", "200"))
+
+# schema dos bancos (propriedades e opções) em cache para validar escritas sem ida ao Notion
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+
+# escritas assíncronas: `?async=true` / `Prefer: respond-async` grava no outbox e responde 202
+OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "1") != "0"
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "notion_outbox.db")
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "3"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+WRITES_ASYNC = os.getenv("WRITES_ASYNC", "0") != "0"
+# PATCHes de propriedades da mesma página dentro desta janela (s) viram um só; 0 desliga
+WRITE_COALESCE_WINDOW = float(os.getenv("WRITE_COALESCE_WINDOW", "0.2"))
+
+# respostas acima deste tamanho (bytes) saem com gzip se o cliente aceitar
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+tokens = TokenStore(TOKENS_FILE, active_id=os.getenv(WORKSPACE_ID_ENV))
 
 def get_token():
-    with open(TOKENS_FILE, "r") as f:
-        tokens = json.load(f)
-    return list(tokens.values())[0]["access_token"]
-
-def notion_headers(token: str, json_ct: bool = True):
-    h = {
-        "Authorization": f"Bearer {token}",
-        "Notion-Version": NOTION_VERSION
-    }
-    if json_ct:
-        h["Content-Type"] = "application/json"
-    return h
+    """Token do workspace da requisição (header X-Notion-Workspace ou /w/{id}/...), senão o ativo."""
+    return tokens.token(current_workspace.get())
+
+# ---------- MÉTRICAS (coleta) ----------
+metrics = Registry()
+notion_requests = metrics.counter(
+    "notion_requests_total", "Chamadas ao Notion por endpoint e status (cada retry conta)",
+    ("workspace", "method", "endpoint", "status"))
+notion_latency = metrics.histogram(
+    "notion_request_duration_seconds", "Latência das chamadas ao Notion", ("workspace", "method", "endpoint"))
+notion_wait = metrics.histogram(
+    "notion_ratelimit_wait_seconds", "Espera na fila do RateLimiter antes de cada chamada",
+    ("workspace", "method", "endpoint"))
+llm_requests = metrics.counter(
+    "llm_requests_total", "Chamadas ao LLM (fora do cache)", ("model", "mode", "outcome"))
+llm_latency = metrics.histogram(
+    "llm_request_duration_seconds", "Duração das chamadas ao LLM até a resposta completa", ("model", "mode"))
+llm_first_token = metrics.histogram(
+    "llm_first_token_seconds", "Tempo até o primeiro pedaço de texto no streaming", ("model",))
+llm_tokens = metrics.counter(
+    "llm_tokens_total", "Tokens consumidos no LLM", ("model", "kind"))
+startup_seconds = metrics.gauge(
+    "app_startup_seconds", "Duração de cada fase do startup", ("phase",))
+
+def observe_notion(workspace_id: str, method: str, endpoint: str, status: str, seconds: float, waited: float):
+    notion_requests.inc(workspace_id, method, endpoint, status)
+    notion_latency.observe(seconds, workspace_id, method, endpoint)
+    notion_wait.observe(waited, workspace_id, method, endpoint)
+
+def observe_llm(mode: str, start: float, usage, outcome: str, first_token: Optional[float] = None):
+    llm_requests.inc(OPENAI_MODEL, mode, outcome)
+    llm_latency.observe(time.perf_counter() - start, OPENAI_MODEL, mode)
+    if first_token is not None:
+        llm_first_token.observe(first_token, OPENAI_MODEL)
+    if usage is not None:
+        llm_tokens.inc(OPENAI_MODEL, "prompt", amount=usage.prompt_tokens or 0)
+        llm_tokens.inc(OPENAI_MODEL, "completion", amount=usage.completion_tokens or 0)
+
+# ---------- CLIENTE OPENAI ----------
+openai_client = None
+_openai_lock = threading.Lock()
+
+def get_openai():
+    """AsyncOpenAI único do processo: o pool de conexões é reaproveitado entre os insights."""
+    global openai_client
+    with _openai_lock:
+        if openai_client is None:
+            from openai import AsyncOpenAI
+            openai_client = AsyncOpenAI()
+        return openai_client
+
+async def close_openai():
+    global openai_client
+    if openai_client is not None:
+        await openai_client.close()
+        openai_client = None
+
+async def timed(phase: str, awaitable):
+    start = time.perf_counter()
+    result = await awaitable
+    startup_seconds.set(time.perf_counter() - start, phase)
+    return result
+
+async def warm_up():
+    """
+    Roda depois que o app já aceita requisições: importa pandas e openai (fora do event loop)
+    e abre a conexão com o OpenAI, para o primeiro insight/relatório não pagar por isso.
+    """
+    if PRELOAD_ANALYTICS:
+        await timed("analytics_import", asyncio.to_thread(get_engagement_cache))
+    try:
+        client = await timed("openai_client", asyncio.to_thread(get_openai))
+        if OPENAI_PREWARM:
+            await timed("openai_prewarm", client.models.list())
+    except Exception as e:
+        # sem chave/rede no startup: o erro real aparece na rota, como antes
+        log.warning("pré-aquecimento do OpenAI falhou: %s", e)
+
+# ---------- CLIENTE NOTION (um por workspace) ----------
+def make_workspace(workspace_id: str) -> Workspace:
+    """Pool de conexões, RateLimiter, schema e índice de títulos próprios do workspace."""
+    client = NotionAPI(
+        base_url=os.getenv("NOTION_API_URL", NOTION_API_URL),
+        limiter=RateLimiter(rate=NOTION_RATE_LIMIT, burst=NOTION_RATE_BURST),
+        max_retries=NOTION_MAX_RETRIES,
+        coalesce=os.getenv("NOTION_COALESCE", "1") != "0",
+        observer=functools.partial(observe_notion, workspace_id),
+    )
+    return Workspace(workspace_id, client, SchemaCache(client, ttl=SCHEMA_CACHE_TTL), TitleIndex())
+
+workspaces = WorkspacePool(tokens, make_workspace)
+# do workspace da requisição; em segundo plano (réplica), do ativo
+notion = Current(workspaces, "notion")
+schemas = Current(workspaces, "schemas")
+titles = Current(workspaces, "titles")
+
+replica = Replica(REPLICA_PATH) if REPLICA_ENABLED else None
+replica_sync = ReplicaSync(
+    replica, notion,
+    [os.getenv(DATABASE_ID_ENV) or KANBAN_DATABASE_ID, CONTENT_PLANNED_DATABASE_ID],
+    interval=REPLICA_SYNC_INTERVAL,
+) if replica else None
+
+outbox = Outbox(OUTBOX_PATH) if OUTBOX_ENABLED else None
+
+llm_cache = LLMCache(max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL, path=LLM_CACHE_PATH)
 
-# ---------- FUNÇÃO AUXILIAR ----------
-def safe_get(obj, path, default=None):
+
+# ---------- RÉPLICA: LEITURA / WRITE-THROUGH ----------
+def bind_replica():
+    """
+    No startup: a réplica passa a espelhar o workspace ativo de agora e fica presa a ele
+    (trocar o ativo depois não muda o que ela guarda). O índice de títulos desse workspace a acompanha.
+    """
+    if replica.bind(tokens.active_id):
+        log.warning("réplica era de outro workspace; recarregando do zero para %s", replica.workspace_id)
+    home = workspaces.get(replica.workspace_id)
+    replica.subscribe(home.titles)
+    for database_id in replica_sync.database_ids:
+        home.titles.upsert(replica.query(database_id))
+
+def replica_home() -> bool:
+    """A requisição é do workspace que a réplica espelha (não necessariamente o ativo agora)?"""
+    return replica is not None and workspaces.current_id() == replica.workspace_id
+
+def replica_fresh(database_id: str, max_staleness: Optional[float] = None) -> bool:
+    # só o workspace da réplica lê dela; os demais sempre leem do Notion
+    if replica_sync is None or not replica_home() or not replica_sync.mirrors(database_id):
+        return False
+    bound = REPLICA_MAX_STALENESS if max_staleness is None else max_staleness
+    return replica.is_fresh(database_id, bound)
+
+async def query_recent_pages(database_id: str, token: str, page_size: int,
+                             select_equals=None, max_staleness: Optional[float] = None,
+                             props: Optional[tuple] = None):
+    """
+    databases/query ordenado por created_time desc; usa a réplica se ela estiver dentro do limite de staleness.
+    `props` restringe as propriedades que o Notion devolve (filter_properties).
+    """
+    if replica_fresh(database_id, max_staleness):
+        return replica.query(database_id, limit=page_size, select_equals=select_equals)
+
+    body = {"page_size": page_size, "sorts": [{"timestamp": "created_time", "direction": "descending"}]}
+    if select_equals:
+        body["filter"] = {"property": select_equals[0], "select": {"equals": select_equals[1]}}
+    params = await filter_properties(database_id, token, props)
+    resp = await notion.post(f"/databases/{database_id}/query", token, json=body, params=params)
+    if not resp.is_success:
+        raise HTTPException(resp.status_code, resp.text)
+    return resp.json().get("results", [])
+
+async def query_all_pages(database_id: str, token: str, max_staleness: Optional[float] = None):
+    """Todas as páginas do banco: réplica se estiver fresca, senão o Notion paginado."""
+    if replica_fresh(database_id, max_staleness):
+        return replica.query(database_id)
+    pages = []
+    async for batch in notion.query_database(database_id, token):
+        pages.extend(batch)
+    return pages
+
+def write_through(page: dict):
+    """Aplica na réplica a página devolvida por uma escrita, para leituras seguintes já a enxergarem."""
+    if replica_sync is None or not replica_home():
+        titles.upsert([page])
+        return
+    database_id = (page.get("parent") or {}).get("database_id")
+    if database_id and replica_sync.mirrors(database_id):
+        replica.upsert([page])
+    else:
+        titles.upsert([page])
+
+# ---------- SCHEMA DOS BANCOS (validação local) ----------
+def page_database(page_id: str) -> str:
+    """Banco do card pela réplica; sem ela, o Kanban (as rotas /notion/post/* são do Kanban)."""
+    database_id = replica.database_of(page_id) if replica_home() else None
+    return database_id or os.getenv(DATABASE_ID_ENV) or KANBAN_DATABASE_ID
+
+async def validate_properties(database_id: str, token: str, props: dict, priority: Optional[int] = None):
+    """
+    422 para propriedade, tipo ou opção de select desconhecidos, antes de qualquer escrita
+    (o Notion criaria a opção nova em silêncio). Sem schema disponível, a escrita segue e o Notion decide.
+    """
+    try:
+        await schemas.validate(database_id, token, props, priority)
+    except SchemaError as e:
+        raise HTTPException(422, e.errors)
+    except (NotionError, httpx.HTTPError) as e:
+        log.warning("schema de %s indisponível, escrita sem validação local: %s", database_id, e)
+
+# ---------- CAMPOS ESPARSOS (?fields=) ----------
+async def filter_properties(database_id: str, token: str, props: Optional[tuple]):
+    """
+    Query string `filter_properties` com os ids das propriedades pedidas (o Notion filtra por id).
+    Os ids vêm do schema em cache; sem schema ou com nome desconhecido, devolve tudo (None).
+    """
+    if not props:
+        return None
+    try:
+        schema = await schemas.get(database_id, token)
+    except (NotionError, httpx.HTTPError):
+        return None
+    ids = schema.property_ids(props)
+    return {"filter_properties": ids} if ids else None
+
+def sparse(layout_name: str, fields: Optional[str]):
+    """Extrator + propriedades para o `fields=` da rota; campo desconhecido vira 400."""
+    names = parse_fields(fields)
     try:
-        for key in path:
-            obj = obj[key]
-        return obj
-    except (KeyError, TypeError, IndexError):
-        return default
+        return names, *sparse_extractor(layout_name, names)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+# ---------- LEITURAS CONDICIONAIS (ETag / If-None-Match) ----------
+etag_memo = ETagMemo()
+
+def replica_version(database_id: str, max_staleness: Optional[float] = None):
+    """Versão barata do banco na réplica (None se a leitura não vai sair da réplica)."""
+    if not replica_fresh(database_id, max_staleness):
+        return None
+    return replica.version(database_id)
+
+async def conditional_pages(request: Request, key: tuple, database_id: str, max_staleness, load, render):
+    """
+    Responde 304 se o If-None-Match bate com o ETag do resultado. Com a réplica fresca e a versão
+    do banco igual à do último ETag emitido para `key`, o 304 sai sem carregar nenhuma página.
+    """
+    version = replica_version(database_id, max_staleness)
+    if version is not None:
+        known = etag_memo.get(key, version)
+        if known and etag_matches(request, known):
+            return not_modified(known)
+
+    response = FastJSONResponse(render(await load()))
+    etag = etag_for(response.body, *key)
+    if version is not None:
+        etag_memo.set(key, version, etag)
+    return with_etag(request, response, etag)
+
+def with_etag(request: Request, response, etag: str):
+    """304 se o If-None-Match bate; senão a resposta já renderizada com o ETag."""
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return response
+
 
 # ---------- FASTAPI ----------
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    startup_seconds.set(started - IMPORT_STARTED, "import")
+    tokens.reload()
+    await notion.open()
+    try:
+        # `kill -HUP` força a releitura do tokens.json (indisponível no Windows)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, tokens.reload)
+    except (NotImplementedError, AttributeError, RuntimeError):
+        pass
+    if replica_sync:
+        bind_replica()
+        # a tarefa herda o workspace do contexto: cliente e token sempre os da réplica
+        with use_workspace(replica.workspace_id):
+            replica_sync.start(get_token)
+    if outbox_worker:
+        outbox_worker.start()
+    warmup = asyncio.create_task(warm_up())
+    startup_seconds.set(time.perf_counter() - started, "lifespan")
+    log.info("startup: import %.2fs, lifespan %.2fs", started - IMPORT_STARTED, time.perf_counter() - started)
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        if outbox_worker:
+            await outbox_worker.stop()
+        if replica_sync:
+            await replica_sync.stop()
+        await workspaces.aclose()
+        await close_openai()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+# por último = mais externo: a latência medida inclui o gzip
+app.add_middleware(MetricsMiddleware, registry=metrics)
+# mais externo ainda: o prefixo /w/{id} sai do caminho antes de as métricas resolverem a rota
+app.add_middleware(WorkspaceMiddleware, tokens=tokens)
+
+
+@app.exception_handler(NotionError)
+async def notion_error_handler(request: Request, exc: NotionError):
+    # mesmo formato de HTTPException(resp.status_code, resp.text)
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.text})
 
 
 # ---------- MODELOS ----------
@@ -48,36 +396,44 @@ class PostCreate(BaseModel):
 
 # ---------- RESOLVE TÍTULO ----------
 @app.post("/notion/pages/resolve-title")
-def resolve_title_to_page_id(body: dict):
+async def resolve_title_to_page_id(body: dict):
+    """
+    Busca no índice local (sem acentos / maiúsculas). `match: "prefix"` aceita início do título.
+    Se o índice não conhecer o título, cai no /search do Notion e alimenta o índice com o resultado.
+    Com títulos duplicados, `page_id` é o card editado mais recentemente e `matches` lista todos.
+    """
     title = body.get("title", "").strip()
     if not title:
         raise HTTPException(400, "Missing title")
+    prefix = body.get("match") == "prefix"
 
-    token = get_token()
-    resp = requests.post(
-        "https://api.notion.com/v1/search",
-        headers=notion_headers(token),
-        json={"query": title, "sort": {"direction": "descending", "timestamp": "last_edited_time"}}
-    )
-    data = resp.json()
+    def find():
+        return titles.prefix(title) if prefix else titles.lookup(title)
 
-    for res in data.get("results", []):
-        props = res.get("properties", {})
-        # Verifica diferentes campos que podem conter o título
-        possible_titles = [
-            safe_get(props, ["Nome", "title", 0, "text", "content"]),
-            safe_get(props, ["📌 Título do Post", "title", 0, "text", "content"])
-        ]
-        if any(t and t.lower() == title.lower() for t in possible_titles):
-            return {"page_id": res["id"]}
+    matches = find()
+    if not matches:
+        token = get_token()
+        resp = await notion.post(
+            "/search", token,
+            json={"query": title, "sort": {"direction": "descending", "timestamp": "last_edited_time"}}
+        )
+        if not resp.is_success:
+            raise HTTPException(resp.status_code, resp.text)
+        titles.upsert(r for r in resp.json().get("results", []) if r.get("object") == "page")
+        matches = find()
+
+    if not matches:
+        raise HTTPException(404, "Title not found")
 
-    raise HTTPException(404, "Title not found")
+    result = {"page_id": matches[0]["page_id"]}
+    if len(matches) > 1:
+        result["matches"] = matches
+    return result
 
 
 # ---------- CRIAR CARD ----------
-@app.post("/notion/create-post")
-def create_post(payload: PostCreate):
-    token = get_token()
+def card_properties(payload: PostCreate):
+    """Banco de destino e propriedades do card."""
     database_id = os.getenv(DATABASE_ID_ENV) or \
                   payload.dict().get("database_id") or \
                   "2062b868-6ff2-81cf-b7f5-e379236da5cf"
@@ -89,186 +445,415 @@ def create_post(payload: PostCreate):
         "Status": {"select": {"name": payload.Status}},
         "Tipo de post": {"select": {"name": payload.Tipo___de___post}},
         "Data de postagem": {"date": {"start": payload.Data___de___postagem}},
-        "Hashtags": {"rich_text": [{"text": {"content": payload.Hashtags}}]}
+        "Hashtags": {"rich_text": [{"text": {"content": payload.Hashtags or ""}}]}
     }
+    return database_id, props
 
-    # cria página
-    page = requests.post(
-        "https://api.notion.com/v1/pages",
-        headers=notion_headers(token),
-        json={"parent": {"database_id": database_id}, "properties": props}
-    )
-    if not page.ok:
-        raise HTTPException(page.status_code, page.text)
-
-    page_id = page.json()["id"]
+async def criar_pagina(payload: PostCreate, token: str, priority: int = WRITE, validate: bool = True) -> str:
+    """Cria o card em uma única chamada: propriedades + copy (children) no mesmo POST /pages."""
+    database_id, props = card_properties(payload)
+    if validate:
+        await validate_properties(database_id, token, props, priority)
 
-    # adiciona copy se existir
+    body = {"parent": {"database_id": database_id}, "properties": props}
     if payload.description:
-        requests.patch(
-            f"https://api.notion.com/v1/blocks/{page_id}/children",
-            headers=notion_headers(token),
-            json={
-                "children": [{
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": payload.description}
-                        }]
-                    }
-                }]
-            }
-        )
+        body["children"] = paragraph_blocks(payload.description)
+
+    page = await notion.post("/pages", token, json=body, priority=priority)
+    if not page.is_success:
+        raise HTTPException(page.status_code, page.text)
+
+    write_through(page.json())
+    return page.json()["id"]
 
+@app.post("/notion/create-post")
+async def create_post(payload: PostCreate, request: Request):
+    token = get_token()
+    if wants_async(request):
+        database_id, props = card_properties(payload)
+        await validate_properties(database_id, token, props)
+        # minuto da entrada (o created_time do Notion também é por minuto): base da conferência nas repetições
+        requested_at = time.strftime("%Y-%m-%dT%H:%M:00.000Z", time.gmtime())
+        return accepted("create_post", {"post": payload.dict(), "requested_at": requested_at})
+    page_id = await criar_pagina(payload, token)
     return {"status": "success", "page_id": page_id}
 
 
-# ---------- ATUALIZAR PROPRIEDADES ----------
-@app.patch("/notion/post/{page_id}")
-def update_post(page_id: str, body: dict):
+# ---------- CRIAR VÁRIOS CARDS ----------
+@app.post("/notion/create-posts")
+async def create_posts(payloads: List[PostCreate]):
+    """
+    Cria um lote de cards (ex.: 10–30 ideias geradas pelo agente de uma vez).
+    O lote inteiro é validado contra o schema em cache antes de qualquer criação: um item inválido
+    devolve 422 com o erro de cada item e nada é criado. As criações rodam em paralelo
+    limitadas por BULK_CREATE_CONCURRENCY e o resultado sai na mesma ordem da entrada.
+    """
+    if len(payloads) > BULK_CREATE_MAX_ITEMS:
+        raise HTTPException(400, f"Máximo de {BULK_CREATE_MAX_ITEMS} itens por lote")
+
     token = get_token()
-    props = {
-        "Nome": {"title": [{"text": {"content": body.get("Nome", "")}}]},
-        "Status": {"select": {"name": body.get("Status")}},
-        "Tipo de post": {"select": {"name": body.get('Tipo___de___post') or body.get('Tipo de post')}} ,
-        "Hashtags": {"rich_text": [{"text": {"content": body.get("Hashtags", "")}}]},
-        "Data de postagem": {"date": {"start": body.get("Data___de___postagem") or body.get("Data de postagem")}}
-    }
-    resp = requests.patch(
-        f"https://api.notion.com/v1/pages/{page_id}",
-        headers=notion_headers(token),
+    invalid = []
+    for index, payload in enumerate(payloads):
+        database_id, props = card_properties(payload)
+        try:
+            await validate_properties(database_id, token, props, BULK)
+        except HTTPException as e:
+            invalid.append({"index": index, "status": "error", "status_code": e.status_code, "error": e.detail})
+    if invalid:
+        failed = {r["index"]: r for r in invalid}
+        results = [failed.get(i, {"index": i, "status": "skipped"}) for i in range(len(payloads))]
+        return JSONResponse(status_code=422, content={"created": 0, "failed": len(invalid), "results": results})
+
+    sem = asyncio.Semaphore(BULK_CREATE_CONCURRENCY)
+
+    async def criar(index: int, payload: PostCreate):
+        async with sem:
+            try:
+                page_id = await criar_pagina(payload, token, priority=BULK, validate=False)
+                return {"index": index, "status": "success", "page_id": page_id}
+            except HTTPException as e:
+                return {"index": index, "status": "error", "status_code": e.status_code, "error": e.detail}
+            except NotionError as e:
+                return {"index": index, "status": "error", "status_code": e.status_code, "error": e.text}
+            except httpx.HTTPError as e:
+                return {"index": index, "status": "error", "status_code": 502, "error": str(e)}
+
+    results = await asyncio.gather(*(criar(i, p) for i, p in enumerate(payloads)))
+    created = sum(1 for r in results if r["status"] == "success")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+# ---------- ATUALIZAR PROPRIEDADES ----------
+# campo do corpo (aceita as duas grafias) -> propriedade do Notion
+POST_FIELDS = {
+    "Nome": ("Nome",),
+    "Status": ("Status",),
+    "Tipo de post": ("Tipo___de___post", "Tipo de post"),
+    "Hashtags": ("Hashtags",),
+    "Data de postagem": ("Data___de___postagem", "Data de postagem"),
+}
+
+def post_properties(body: dict) -> dict:
+    """Só as propriedades presentes no corpo: campo ausente não é apagado no Notion."""
+    given = {}
+    for prop, keys in POST_FIELDS.items():
+        key = next((k for k in keys if k in body), None)
+        if key is not None:
+            given[prop] = body[key]
+
+    props = {}
+    if "Nome" in given:
+        props["Nome"] = {"title": [{"text": {"content": given["Nome"] or ""}}]}
+    for prop in ("Status", "Tipo de post"):
+        if prop in given:
+            props[prop] = {"select": {"name": given[prop]} if given[prop] else None}
+    if "Hashtags" in given:
+        props["Hashtags"] = {"rich_text": [{"text": {"content": given["Hashtags"] or ""}}]}
+    if "Data de postagem" in given:
+        props["Data de postagem"] = {"date": {"start": given["Data de postagem"]} if given["Data de postagem"] else None}
+    return props
+
+async def enviar_propriedades(key: tuple, props: dict) -> dict:
+    """
+    Envia o PATCH já mesclado: cada propriedade pedida vai uma vez só, com o último valor.
+    Não compara com a réplica: ela pode estar atrasada em relação a edições feitas no Notion.
+    """
+    token, page_id = key
+    resp = await notion.patch(
+        f"/pages/{page_id}", token,
         json={"properties": props}
     )
-    if not resp.ok:
+    if not resp.is_success:
         raise HTTPException(resp.status_code, resp.text)
+    write_through(resp.json())
+    return resp.json()
+
+patches = PatchCoalescer(enviar_propriedades, window=WRITE_COALESCE_WINDOW)
+
+async def atualizar_propriedades(page_id: str, props: dict, token: str):
+    """Valida e entra na janela de coalescência da página (PATCHes próximos saem juntos)."""
+    await validate_properties(page_database(page_id), token, props)
+    await patches.patch((token, page_id), props)
+
+@app.patch("/notion/post/{page_id}")
+async def update_post(page_id: str, body: dict, request: Request):
+    token = get_token()
+    props = post_properties(body)
+    if not props:
+        raise HTTPException(400, "Nenhuma propriedade para atualizar")
+    if wants_async(request):
+        await validate_properties(page_database(page_id), token, props)
+        return accepted("update_post", {"page_id": page_id, "properties": props}, page_id)
+    await atualizar_propriedades(page_id, props, token)
     return {"status": "success", "details": "Post atualizado"}
 
 
 # ---------- ATUALIZAR STATUS ----------
 @app.patch("/notion/post/{page_id}/status")
-def update_status(page_id: str, body: dict):
+async def update_status(page_id: str, body: dict, request: Request):
     token = get_token()
-    resp = requests.patch(
-        f"https://api.notion.com/v1/pages/{page_id}",
-        headers=notion_headers(token),
-        json={"properties": {"Status": {"select": {"name": body.get("status")}}}}
-    )
-    if not resp.ok:
-        raise HTTPException(resp.status_code, resp.text)
+    props = {"Status": {"select": {"name": body.get("status")}}}
+    if wants_async(request):
+        await validate_properties(page_database(page_id), token, props)
+        return accepted("update_status", {"page_id": page_id, "properties": props}, page_id)
+    await atualizar_propriedades(page_id, props, token)
     return {"status": "success"}
 
 
 # ---------- EXCLUIR (arquivar) ----------
-@app.delete("/notion/post/{page_id}")
-def delete_post(page_id: str):
-    token = get_token()
-    resp = requests.patch(
-        f"https://api.notion.com/v1/pages/{page_id}",
-        headers=notion_headers(token),
+async def arquivar_pagina(page_id: str, token: str):
+    resp = await notion.patch(
+        f"/pages/{page_id}", token,
         json={"archived": True}
     )
-    if not resp.ok:
+    if not resp.is_success:
         raise HTTPException(resp.status_code, resp.text)
+    if replica_home():
+        replica.mark_archived(page_id)
+    else:
+        titles.remove([page_id])
+
+@app.delete("/notion/post/{page_id}")
+async def delete_post(page_id: str, request: Request):
+    if wants_async(request):
+        return accepted("delete_post", {"page_id": page_id}, page_id)
+    await arquivar_pagina(page_id, get_token())
     return {"status": "success"}
 
 
+# ---------- ESCRITAS ASSÍNCRONAS (outbox) ----------
+async def card_ja_criado(post: PostCreate, token: str, since: str) -> Optional[str]:
+    """
+    Card com o mesmo título criado a partir de `since` (minuto da entrada do job), se houver.
+    Um POST /pages que deu timeout ou 5xx pode ter criado a página mesmo assim.
+    """
+    database_id, props = card_properties(post)
+    body = {"filter": {"and": [
+        {"property": "Nome", "title": {"equals": post.Nome}},
+        {"timestamp": "created_time", "created_time": {"on_or_after": since}},
+    ]}}
+    resp = await notion.post(f"/databases/{database_id}/query", token, json=body, priority=WRITE)
+    if not resp.is_success:
+        raise HTTPException(resp.status_code, resp.text)
+    for page in resp.json().get("results", []):
+        title = "".join(t.get("plain_text") or (t.get("text") or {}).get("content", "")
+                        for t in (page.get("properties", {}).get("Nome") or {}).get("title") or [])
+        if title == post.Nome and (page.get("created_time") or "") >= since:
+            write_through(page)
+            return page["id"]
+    return None
+
+async def job_create_post(payload: dict, attempt: int) -> dict:
+    post = PostCreate(**payload["post"])
+    with use_workspace(payload["workspace_id"]):
+        token = get_token()
+        # repetição: a tentativa anterior pode ter criado o card; confere antes de criar outro
+        if attempt > 1 and payload.get("requested_at"):
+            page_id = await card_ja_criado(post, token, payload["requested_at"])
+            if page_id:
+                return {"page_id": page_id}
+        return {"page_id": await criar_pagina(post, token)}
+
+async def job_update_properties(payload: dict, attempt: int) -> dict:
+    with use_workspace(payload["workspace_id"]):
+        await atualizar_propriedades(payload["page_id"], payload["properties"], get_token())
+    return {}
+
+def merge_property_jobs(payloads: List[dict]) -> dict:
+    """Atualizações seguidas da mesma página na fila: um PATCH só, última escrita vence por propriedade."""
+    props = {}
+    for payload in payloads:
+        props.update(payload["properties"])
+    return {**payloads[0], "properties": props}
+
+async def job_delete_post(payload: dict, attempt: int) -> dict:
+    with use_workspace(payload["workspace_id"]):
+        await arquivar_pagina(payload["page_id"], get_token())
+    return {}
+
+outbox_worker = OutboxWorker(
+    outbox, {
+        "create_post": job_create_post,
+        "update_post": job_update_properties,
+        "update_status": job_update_properties,
+        "delete_post": job_delete_post,
+    },
+    concurrency=OUTBOX_WORKERS, max_attempts=OUTBOX_MAX_ATTEMPTS,
+    mergeable=("update_post", "update_status"), merge=merge_property_jobs,
+) if outbox else None
+
+def wants_async(request: Request) -> bool:
+    """`?async=true` ou `Prefer: respond-async` (WRITES_ASYNC=1 liga para todas as escritas)."""
+    if outbox is None:
+        return False
+    flag = request.query_params.get("async")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    return WRITES_ASYNC or "respond-async" in request.headers.get("prefer", "")
+
+def accepted(kind: str, payload: dict, page_id: Optional[str] = None) -> JSONResponse:
+    """Grava o job no outbox (durável antes de responder) e devolve 202 com o id."""
+    job = outbox.enqueue(kind, {**payload, "workspace_id": workspaces.current_id()}, page_id)
+    outbox_worker.notify()
+    url = f"/jobs/{job['job_id']}"
+    return JSONResponse(status_code=202, content={**job, "status_url": url}, headers={"Location": url})
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = outbox.get(job_id) if outbox else None
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
 # ---------- ATUALIZAR COPY/LEGENDA ----------
 @app.patch("/notion/post/{page_id}/content")
-def update_content(page_id: str, body: dict):
+async def update_content(page_id: str, body: dict):
+    """
+    Por padrão compara a nova legenda com os parágrafos atuais e só mexe no que mudou
+    (legenda idêntica = nenhuma escrita). `mode: "replace"` arquiva tudo e reescreve.
+    As escritas saem em paralelo; o RateLimiter segura o ritmo.
+    """
     description = body.get("description", "").strip()
     if not description:
         raise HTTPException(400, "Descrição vazia")
+    mode = body.get("mode", "diff")
+    if mode not in ("diff", "replace"):
+        raise HTTPException(400, "mode deve ser 'diff' ou 'replace'")
 
     token = get_token()
+    plan = await sync_paragraphs(notion, page_id, token, description, replace=(mode == "replace"))
 
-    # 1. Recupera os blocos filhos (para deletar)
-    children = requests.get(
-        f"https://api.notion.com/v1/blocks/{page_id}/children",
-        headers=notion_headers(token, json_ct=False)
-    ).json().get("results", [])
-
-    # 2. Remove os blocos existentes
-    for block in children:
-        block_id = block["id"]
-        requests.patch(
-            f"https://api.notion.com/v1/blocks/{block_id}",
-            headers=notion_headers(token),
-            json={"archived": True}
-        )
-
-    # 3. Adiciona novo bloco com a nova legenda
-    resp = requests.patch(
-        f"https://api.notion.com/v1/blocks/{page_id}/children",
-        headers=notion_headers(token),
-        json={"children": [{
-            "object": "block",
-            "type": "paragraph",
-            "paragraph": {
-                "rich_text": [{
-                    "type": "text",
-                    "text": {"content": description}
-                }]
-            }
-        }]}
-    )
-
-    if not resp.ok:
-        raise HTTPException(resp.status_code, resp.text)
-    return {"status": "success"}
+    return {
+        "status": "success",
+        "kept": len(plan.kept),
+        "updated": len(plan.update),
+        "archived": len(plan.archive),
+        "created": len(plan.append),
+    }
 
 
 # ---------- SUMÁRIO (contagens) ----------
 @app.get("/notion/summary/{database_id}")
-def summary(database_id: str):
+async def summary(request: Request, database_id: str, max_staleness: Optional[float] = Query(None, ge=0)):
+    key = ("summary", database_id)
+    if replica_fresh(database_id, max_staleness):
+        async def load():
+            return replica.query(database_id)
+        def render(pages):
+            result = KanbanSummary()
+            result.add_pages(pages)
+            return result.as_dict()
+        return await conditional_pages(request, key, database_id, max_staleness, load, render)
+
+    # sem réplica: contagem em streaming, lote a lote; o ETag sai do sumário renderizado
     token = get_token()
-    resp = requests.post(
-        f"https://api.notion.com/v1/databases/{database_id}/query",
-        headers=notion_headers(token)
-    )
-    if not resp.ok:
-        raise HTTPException(resp.status_code, resp.text)
-
-    status_count, type_count = {}, {}
-    for page in resp.json().get("results", []):
-        status = page["properties"]["Status"]["select"]["name"]
-        tipo   = page["properties"]["Tipo de post"]["select"]["name"]
-        status_count[status] = status_count.get(status, 0) + 1
-        type_count[tipo]     = type_count.get(tipo, 0) + 1
-
-    return {"status_summary": status_count, "type_summary": type_count}
+    result = KanbanSummary()
+    async for batch in notion.query_database(database_id, token):
+        result.add_pages(batch)
+    response = JSONResponse(result.as_dict())
+    return with_etag(request, response, etag_for(response.body, *key))
 
 
 # ---------- LISTAR RECENTES ----------
 @app.get("/notion/recent/{database_id}")
-def recent(database_id: str, limit: int = Query(10, gt=0, le=50)):
-    token = get_token()
-    response = requests.post(
-        f"https://api.notion.com/v1/databases/{database_id}/query",
-        headers=notion_headers(token),
-        json={
-            "page_size": limit,
-            "sorts": [{"timestamp": "created_time", "direction": "descending"}]
-        }
-    )
+async def recent(request: Request, database_id: str, limit: int = Query(10, gt=0, le=50),
+                 max_staleness: Optional[float] = Query(None, ge=0),
+                 fields: Optional[str] = Query(None, description="Campos separados por vírgula (nome,status,tipo,data_postagem)")):
+    names, extract, props = sparse("recent", fields)
+    async def load():
+        return await query_recent_pages(database_id, get_token(), limit, max_staleness=max_staleness, props=props)
+    def render(results):
+        return [{"id": p["id"], **extract(p["properties"])} for p in results]
+    return await conditional_pages(request, ("recent", database_id, limit, names), database_id,
+                                   max_staleness, load, render)
+
+# ---------- SCHEMA (propriedades e opções válidas) ----------
+@app.get("/notion/schema/{database_id}")
+async def database_schema(database_id: str):
+    """Tipos e opções de select/status do banco, do cache (substitui o listar_status.py)."""
+    return (await schemas.get(database_id, get_token())).describe()
+
+# ---------- ADMIN: TOKENS ----------
+@app.get("/admin/tokens")
+def list_workspaces():
+    loaded = workspaces.items()
+    listed = {wid: {**info, "loaded": wid in loaded} for wid, info in tokens.workspaces().items()}
+    return {"active": tokens.active_id, "workspaces": listed}
+
+@app.post("/admin/tokens/reload")
+def reload_tokens():
+    return {"status": "success", "active": tokens.reload()}
+
+@app.post("/admin/tokens/active/{workspace_id}")
+def set_active_workspace(workspace_id: str):
+    try:
+        tokens.set_active(workspace_id)
+    except KeyError:
+        raise HTTPException(404, "Workspace not found")
+    return {"status": "success", "active": workspace_id}
+
+# ---------- ADMIN: CACHE DO LLM ----------
+@app.get("/admin/llm-cache")
+def llm_cache_stats():
+    return llm_cache.stats()
+
+@app.delete("/admin/llm-cache")
+def clear_llm_cache():
+    llm_cache.clear()
+    return {"status": "success"}
 
-    if not response.ok:
-        raise HTTPException(response.status_code, response.text)
+# ---------- ADMIN: CACHE DE SCHEMA ----------
+@app.get("/admin/schema-cache")
+def schema_cache_stats():
+    return schemas.stats()
 
-    posts = []
-    for p in response.json()["results"]:
-        props = p["properties"]
-        post = {
-            "id": p["id"],
-            "nome": safe_get(props, ["Nome", "title", 0, "plain_text"], "Sem título"),
-            "status": safe_get(props, ["Status", "select", "name"], "Não definido"),
-            "tipo": safe_get(props, ["Tipo de post", "select", "name"], "Não definido"),
-            "data_postagem": safe_get(props, ["Data de postagem", "date", "start"]),
-        }
-        posts.append(post)
+@app.delete("/admin/schema-cache")
+def clear_schema_cache(database_id: Optional[str] = None):
+    """Esquece o schema (de um banco ou de todos): a próxima escrita busca de novo no Notion."""
+    schemas.invalidate(database_id)
+    return {"status": "success"}
 
-    return posts
+# ---------- MÉTRICAS (/metrics) ----------
+def cache_counts() -> dict:
+    schema_caches = [w.schemas for w in workspaces.items().values()]
+    counts = {("llm", "hit"): llm_cache.hits, ("llm", "miss"): llm_cache.misses,
+              ("schema", "hit"): sum(c.hits for c in schema_caches),
+              ("schema", "miss"): sum(c.misses for c in schema_caches)}
+    if engagement_cache is not None:
+        counts[("engagement", "hit")] = engagement_cache.hits
+        counts[("engagement", "miss")] = engagement_cache.misses
+    return counts
+
+def cache_ratios() -> dict:
+    counts = cache_counts()
+    ratios = {"llm": llm_cache.stats()["hit_ratio"]}
+    if counts[("schema", "hit")] + counts[("schema", "miss")]:
+        ratios["schema"] = counts[("schema", "hit")] / (counts[("schema", "hit")] + counts[("schema", "miss")])
+    if engagement_cache is not None and engagement_cache.hits + engagement_cache.misses:
+        ratios["engagement"] = engagement_cache.hits / (engagement_cache.hits + engagement_cache.misses)
+    return ratios
+
+metrics.callback("cache_requests_total", "Consultas aos caches por resultado", "counter",
+                 cache_counts, ("cache", "result"))
+metrics.callback("cache_hit_ratio", "Proporção de hits por cache", "gauge", cache_ratios, ("cache",))
+metrics.callback("llm_cache_entries", "Respostas do LLM em memória", "gauge",
+                 lambda: llm_cache.stats()["entries"])
+metrics.callback("notion_coalesced_requests_total", "Leituras atendidas por uma chamada já em andamento",
+                 "counter", lambda: {wid: w.notion.coalesced for wid, w in workspaces.items().items()},
+                 ("workspace",))
+metrics.callback("outbox_jobs", "Jobs de escrita no outbox por status", "gauge",
+                 lambda: outbox.counts() if outbox else None, ("status",))
+metrics.callback("notion_patches_coalesced_total", "Escritas de propriedades absorvidas por outro PATCH",
+                 "counter", lambda: {"window": patches.merged,
+                                     "outbox": outbox_worker.merged if outbox_worker else 0}, ("source",))
+metrics.callback("notion_ratelimit_pending", "Chamadas esperando no RateLimiter", "gauge",
+                 lambda: {wid: w.notion.limiter.pending for wid, w in workspaces.items().items()},
+                 ("workspace",))
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # ---------- DEBUG: ROTAS ----------
 @app.get("/routes")
@@ -276,38 +861,44 @@ def list_routes():
     return [route.path for route in app.routes]
 
 # ---------- ANÁLISE DO KANBAN ----------
+kanban_lock = asyncio.Lock()
+
 @app.get("/analyze-kanban")
-def analyze_kanban():
+async def analyze_kanban():
+    """
+    Compara o Kanban atual com o snapshot da última análise (status_anterior.json) e devolve
+    contagens, cards novos / movidos / arquivados e o relatório em markdown.
+    Com a réplica em dia, só as páginas alteradas desde a marca d'água são lidas.
+    """
     token = get_token()
     database_id = os.getenv(DATABASE_ID_ENV) or "2062b8686ff281cfb7f5e379236da5cf"
 
-    resp = requests.post(
-        f"https://api.notion.com/v1/databases/{database_id}/query",
-        headers=notion_headers(token)
-    )
-
-    if not resp.ok:
-        raise HTTPException(resp.status_code, resp.text)
-
-    data = resp.json()
-    status_count = {}
-    type_count = {}
-
-    for page in data.get("results", []):
-        props = page.get("properties", {})
-        status = props.get("Status", {}).get("select", {}).get("name", "Indefinido")
-        tipo = props.get("Tipo de post", {}).get("select", {}).get("name", "Indefinido")
-
-        status_count[status] = status_count.get(status, 0) + 1
-        type_count[tipo] = type_count.get(tipo, 0) + 1
-
+    async with kanban_lock:
+        snapshot = await asyncio.to_thread(KanbanSnapshot.load, SNAPSHOT_FILE)
+        if replica_fresh(database_id) and snapshot.watermark:
+            delta = snapshot.apply(
+                replica.changed_since(database_id, snapshot.watermark, snapshot.archived_after))
+        elif replica_fresh(database_id):
+            delta = snapshot.replace_all(replica.query(database_id))
+        else:
+            # sem réplica: compara lote a lote, sem montar a lista completa de páginas
+            sweep = snapshot.full_sweep()
+            async for batch in notion.query_database(database_id, token):
+                sweep.add(batch)
+            delta = sweep.finish()
+        await asyncio.to_thread(snapshot.save, SNAPSHOT_FILE)
+
+    status_count, type_count = snapshot.counts()
     return {
-        "status_summary": status_count,
-        "type_summary": type_count
+        "status_summary": dict(status_count),
+        "type_summary": dict(type_count),
+        "alteracoes": delta,
+        "relatorio": gerar_relatorio_kanban(snapshot, delta),
     }
+
 # ---------- NOVA ROTA COMPATÍVEL ----------
 @app.post("/create-idea")
-def create_idea(body: dict):
+async def create_idea(body: dict, request: Request):
     """
     Compatível com o agente: espera chaves minúsculas (nome, status, tipo, hashtags, data_postagem, descricao).
     Redireciona internamente para a lógica já existente de /notion/create-post.
@@ -320,150 +911,81 @@ def create_idea(body: dict):
         Hashtags            = body.get("hashtags", ""),
         description         = body.get("descricao", "")
     )
-    return create_post(payload)
+    return await create_post(payload, request)
 
 # ---------- TABELA DE CONTEÚDO PLANEJADO ----------
 @app.get("/notion/content-planned/{_}")
-def list_planned_content(_: str):
-    token = get_token()
+async def list_planned_content(request: Request, _: str, max_staleness: Optional[float] = Query(None, ge=0),
+                               fields: Optional[str] = Query(None, description="Campos separados por vírgula (ex.: titulo,data_publicacao)")):
     database_id = CONTENT_PLANNED_DATABASE_ID
-    resp = requests.post(
-        f"https://api.notion.com/v1/databases/{database_id}/query",
-        headers=notion_headers(token),
-        json={"page_size": 20, "sorts": [{"timestamp": "created_time", "direction": "descending"}]}
-    )
-    if not resp.ok:
+    names, extract, props = sparse("content", fields)
+    async def load():
+        return await query_recent_pages(database_id, get_token(), 20, max_staleness=max_staleness, props=props)
+    def render(results):
+        return [{"id": p["id"], **extract(p["properties"])} for p in results]
+    return await conditional_pages(request, ("content-planned", database_id, names), database_id,
+                                   max_staleness, load, render)
+
+@app.get("/notion/content/{page_id}")
+async def get_content(page_id: str, fields: Optional[str] = Query(None)):
+    """Um post do Conteúdo Planejado, com os mesmos campos (e `fields=`) da listagem."""
+    token = get_token()
+    _, extract, props = sparse("content", fields)
+    params = await filter_properties(CONTENT_PLANNED_DATABASE_ID, token, props)
+    resp = await notion.get(f"/pages/{page_id}", token, params=params)
+    if not resp.is_success:
         raise HTTPException(resp.status_code, resp.text)
-
-    pages = []
-    for p in resp.json().get("results", []):
-        props = p["properties"]
-        pages.append({
-            "id": p["id"],
-            "titulo": safe_get(props, ["📌 Título do Post", "title", 0, "plain_text"], "Sem título"),
-            "data_publicacao": safe_get(props, ["📆 Data de Publicação", "date", "start"]),
-            "status": safe_get(props, ["📋 Status", "rich_text", 0, "plain_text"]),
-            "tipo": safe_get(props, ["🎨 Tipo", "rich_text", 0, "plain_text"]),
-            "trafego_pago": safe_get(props, ["🚀 Tráfego Pago?", "select", "name"]),
-            "orcamento": safe_get(props, ["💰 Orçamento", "number"]),
-            "legenda": safe_get(props, ["✍️ Legenda / Copy", "rich_text", 0, "plain_text"]),
-            "plataformas": [tag["name"] for tag in safe_get(props, ["📱 Plataforma", "multi_select"], [])],
-            "feedback": safe_get(props, ["💬 Feedback / Observações", "rich_text", 0, "plain_text"]),
-            "engajamento": {
-                "curtidas_1h": safe_get(props, ["❤️ Curtidas (1h)", "number"]),
-                "curtidas_24h": safe_get(props, ["❤️ Curtidas (24h)", "number"]),
-                "curtidas_7d": safe_get(props, ["❤️ Curtidas (7d)", "number"]),
-                "comentarios_1h": safe_get(props, ["💬 Comentários (1h)", "number"]),
-                "comentarios_24h": safe_get(props, ["💬 Comentários (24h)", "number"]),
-                "comentarios_7d": safe_get(props, ["💬 Comentários (7d)", "number"]),
-                "compartilhamentos_1h": safe_get(props, ["🔁 Compartilhamentos (1h)", "number"]),
-                "compartilhamentos_24h": safe_get(props, ["🔁 Compartilhamentos (24h)", "number"]),
-                "compartilhamentos_7d": safe_get(props, ["🔁 Compartilhamentos (7d)", "number"]),
-                "salvamentos_1h": safe_get(props, ["💾 Salvamentos (1h)", "number"]),
-                "salvamentos_24h": safe_get(props, ["💾 Salvamentos (24h)", "number"]),
-                "salvamentos_7d": safe_get(props, ["💾 Salvamentos (7d)", "number"]),
-                "alcance_1h": safe_get(props, ["👀 Alcance (1h)", "number"]),
-                "alcance_24h": safe_get(props, ["👀 Alcance (24h)", "number"]),
-                "alcance_7d": safe_get(props, ["👀 Alcance (7d)", "number"]),
-                "engajamento_total": safe_get(props, ["📈 Engajamento total", "number"]),
-                "taxa_engajamento": safe_get(props, ["📊 Taxa de Engajamento", "number"]),
-            }
-        })
-
-    return pages
+    return {"id": resp.json()["id"], **extract(resp.json().get("properties", {}))}
 
 # ---------- POSTS COM TRÁFEGO PAGO ----------
 @app.get("/notion/content-paid/{database_id}")
-def list_paid_content(database_id: str):
+async def list_paid_content(database_id: str, max_staleness: Optional[float] = Query(None, ge=0),
+                            fields: Optional[str] = Query(None)):
     token = get_token()
-    resp = requests.post(
-        f"https://api.notion.com/v1/databases/{database_id}/query",
-        headers=notion_headers(token),
-        json={
-            "page_size": 50,
-            "filter": {
-                "property": "🚀 Tráfego Pago?",
-                "select": {"equals": "Sim"}
-            },
-            "sorts": [{"timestamp": "created_time", "direction": "descending"}]
-        }
+    _, extract, props = sparse("content", fields)
+    results = await query_recent_pages(
+        database_id, token, 50,
+        select_equals=("🚀 Tráfego Pago?", "Sim"),
+        max_staleness=max_staleness,
+        props=props,
     )
-    if not resp.ok:
-        raise HTTPException(resp.status_code, resp.text)
 
-    pages = []
-    for p in resp.json().get("results", []):
-        props = p["properties"]
-        pages.append({
-            "id": p["id"],
-            "titulo": safe_get(props, ["📌 Título do Post", "title", 0, "plain_text"], "Sem título"),
-            "data_publicacao": safe_get(props, ["📆 Data de Publicação", "date", "start"]),
-            "status": safe_get(props, ["📋 Status", "rich_text", 0, "plain_text"]),
-            "tipo": safe_get(props, ["🎨 Tipo", "rich_text", 0, "plain_text"]),
-            "trafego_pago": safe_get(props, ["🚀 Tráfego Pago?", "select", "name"]),
-            "orcamento": safe_get(props, ["💰 Orçamento", "number"]),
-            "legenda": safe_get(props, ["✍️ Legenda / Copy", "rich_text", 0, "plain_text"]),
-            "plataformas": [tag["name"] for tag in safe_get(props, ["📱 Plataforma", "multi_select"], [])],
-            "feedback": safe_get(props, ["💬 Feedback / Observações", "rich_text", 0, "plain_text"]),
-            "engajamento": {
-                "curtidas_1h": safe_get(props, ["❤️ Curtidas (1h)", "number"]),
-                "curtidas_24h": safe_get(props, ["❤️ Curtidas (24h)", "number"]),
-                "curtidas_7d": safe_get(props, ["❤️ Curtidas (7d)", "number"]),
-                "comentarios_1h": safe_get(props, ["💬 Comentários (1h)", "number"]),
-                "comentarios_24h": safe_get(props, ["💬 Comentários (24h)", "number"]),
-                "comentarios_7d": safe_get(props, ["💬 Comentários (7d)", "number"]),
-                "compartilhamentos_1h": safe_get(props, ["🔁 Compartilhamentos (1h)", "number"]),
-                "compartilhamentos_24h": safe_get(props, ["🔁 Compartilhamentos (24h)", "number"]),
-                "compartilhamentos_7d": safe_get(props, ["🔁 Compartilhamentos (7d)", "number"]),
-                "salvamentos_1h": safe_get(props, ["💾 Salvamentos (1h)", "number"]),
-                "salvamentos_24h": safe_get(props, ["💾 Salvamentos (24h)", "number"]),
-                "salvamentos_7d": safe_get(props, ["💾 Salvamentos (7d)", "number"]),
-                "alcance_1h": safe_get(props, ["👀 Alcance (1h)", "number"]),
-                "alcance_24h": safe_get(props, ["👀 Alcance (24h)", "number"]),
-                "alcance_7d": safe_get(props, ["👀 Alcance (7d)", "number"]),
-                "engajamento_total": safe_get(props, ["📈 Engajamento total", "number"]),
-                "taxa_engajamento": safe_get(props, ["📊 Taxa de Engajamento", "number"]),
-            }
-        })
+    return [{"id": p["id"], **extract(p["properties"])} for p in results]
 
-    return pages
 
+# ---------- ANALYTICS DE ENGAJAMENTO ----------
+# analytics puxa pandas/numpy: importado no warm_up ou na primeira chamada
+engagement_cache = None
+_analytics_lock = threading.Lock()
 
-# ---------- ANÁLISE HISTÓRICA ----------
-@app.get("/notion/insight/history")
-async def gerar_insight_historico():
-    token = get_token()
-    database_id = CONTENT_PLANNED_DATABASE_ID
+def get_engagement_cache():
+    global engagement_cache
+    with _analytics_lock:
+        if engagement_cache is None:
+            from analytics import EngagementCache
+            engagement_cache = EngagementCache()
+        return engagement_cache
 
-    response = requests.post(
-        f"https://api.notion.com/v1/databases/{database_id}/query",
-        headers=notion_headers(token),
-        json={"page_size": 50, "sorts": [{"timestamp": "created_time", "direction": "descending"}]}
-    )
+@app.get("/notion/analytics/engagement")
+async def engagement_analytics(max_staleness: Optional[float] = Query(None, ge=0)):
+    """
+    Agregados vetorizados (pandas) sobre todo o Conteúdo Planejado: por tipo, por plataforma,
+    pago vs orgânico, percentis, crescimento 1h→24h→7d e custo por engajamento.
+    O relatório fica em cache até alguma página entrar, sair ou ter um campo do relatório editado.
+    """
+    token = get_token()
+    pages = await query_all_pages(CONTENT_PLANNED_DATABASE_ID, token, max_staleness)
+    return await asyncio.to_thread(lambda: get_engagement_cache().get(pages))
 
-    if not response.ok:
-        raise HTTPException(response.status_code, response.text)
-
-    posts = []
-    for p in response.json().get("results", []):
-        props = p["properties"]
-        posts.append({
-            "titulo": safe_get(props, ["📌 Título do Post", "title", 0, "plain_text"], "Sem título"),
-            "tipo": safe_get(props, ["🎨 Tipo", "rich_text", 0, "plain_text"]),
-            "trafego_pago": safe_get(props, ["🚀 Tráfego Pago?", "select", "name"]),
-            "orcamento": safe_get(props, ["💰 Orçamento", "number"], 0),
-            "taxa_engajamento": safe_get(props, ["📊 Taxa de Engajamento", "formula", "number"],
-                                           safe_get(props, ["📊 Taxa de Engajamento", "number"], 0)),
-            "engajamento_total": safe_get(props, ["📈 Engajamento total", "formula", "number"],
-                                           safe_get(props, ["📈 Engajamento total", "number"], 0)),
-        })
 
+# ---------- PROMPTS DOS INSIGHTS ----------
+def montar_prompt_historico(posts: List[dict]) -> str:
     exemplos = [
         f"Título: {p['titulo']} | Tipo: {p['tipo']} | Tráfego: {p['trafego_pago']} | Orçamento: R${p['orcamento']} | Engajamento: {p['engajamento_total']} | Taxa: {p.get('taxa_engajamento', 0) or 0:.2f}%"
         for p in posts[:10] if p["titulo"] != "Sem título"
     ]
 
-    prompt = f"""
+    return f"""
 Você é um estrategista de conteúdo. Analise os dados de desempenho de posts anteriores listados abaixo e gere insights sobre o que funcionou bem e o que pode ser melhorado. Identifique padrões que ajudem a orientar a criação de novos conteúdos com base em tipo, tráfego pago e taxa de engajamento.
 
 Posts:
@@ -472,23 +994,12 @@ Posts:
 Seja claro, direto e forneça recomendações práticas.
 """
 
-    insight = await gerar_resposta(prompt)
-    return {"insight": insight}
+def montar_prompt_postagem(data: dict) -> str:
+    engajamento = data.get("engajamento", {})
+    taxa = engajamento.get("taxa_engajamento")
+    taxa_formatada = f"{taxa:.2f}" if taxa is not None else "0"
 
-@app.get("/notion/insight/{page_id}")
-async def gerar_insight_individual(page_id: str):
-    try:
-        data = await buscar_dados_postagem(page_id)
-
-        if not data:
-            return {"erro": "Postagem não encontrada ou dados ausentes."}
-
-        engajamento = data.get("engajamento", {})
-        taxa = engajamento.get("taxa_engajamento")
-        taxa_formatada = f"{taxa:.2f}" if taxa is not None else "0"
-
-        # Gera o prompt com base nos dados obtidos
-        prompt = f"""
+    return f"""
 Você é um especialista em marketing de conteúdo. Analise os dados abaixo de uma publicação em redes sociais com base em suas métricas de engajamento e orçamento, e gere um insight objetivo e estratégico sobre seu desempenho, apontando possíveis melhorias para conteúdos futuros. Seja direto, claro e últil. Os dados são:
 
 Título: {data.get("titulo", "Sem título")}
@@ -507,52 +1018,214 @@ Alcance: {data.get("alcance_7d", 0)}
 Taxa de Engajamento: {taxa_formatada}%
         """
 
-        insight = await gerar_resposta(prompt)
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def insight_stream(prompt: str, refresh: bool) -> StreamingResponse:
+    """Repassa os tokens do LLM como Server-Sent Events: vários `token`, depois `done` (ou `error`)."""
+    async def eventos():
+        partes = []
+        try:
+            async for delta in gerar_resposta_stream(prompt, refresh=refresh):
+                partes.append(delta)
+                yield sse("token", {"delta": delta})
+        except Exception as e:
+            yield sse("error", {"erro": str(e)})
+            return
+        yield sse("done", {"insight": "".join(partes).strip()})
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------- ANÁLISE HISTÓRICA ----------
+@app.get("/notion/insight/history")
+async def gerar_insight_historico(max_staleness: Optional[float] = Query(None, ge=0),
+                                  refresh: bool = Query(False), stream: bool = Query(False)):
+    token = get_token()
+    database_id = CONTENT_PLANNED_DATABASE_ID
+    results = await query_recent_pages(database_id, token, 50, max_staleness=max_staleness)
+
+    posts = [extract_history(p["properties"]) for p in results]
+    prompt = montar_prompt_historico(posts)
+
+    if stream:
+        return insight_stream(prompt, refresh)
+    insight = await gerar_resposta(prompt, refresh=refresh)
+    return {"insight": insight}
+
+@app.get("/notion/insight/{page_id}")
+async def gerar_insight_individual(page_id: str, refresh: bool = Query(False), stream: bool = Query(False)):
+    try:
+        data = await buscar_dados_postagem(page_id)
+
+        if not data:
+            return {"erro": "Postagem não encontrada ou dados ausentes."}
+
+        # Gera o prompt com base nos dados obtidos
+        prompt = montar_prompt_postagem(data)
+
+        if stream:
+            return insight_stream(prompt, refresh)
+        insight = await gerar_resposta(prompt, refresh=refresh)
         return {"insight": insight}
 
     except Exception as e:
         return {"erro": str(e)}
 
 
-# ---------- FUNÇÕES PARA INSIGHTS INDIVIDUAIS ----------
-async def buscar_dados_postagem(page_id):
+# ---------- INSIGHTS EM LOTE ----------
+class InsightBatch(BaseModel):
+    page_ids: Optional[List[str]] = None
+    start: Optional[str] = None                  # YYYY-MM-DD (📆 Data de Publicação)
+    end: Optional[str] = None                    # YYYY-MM-DD, inclusivo
+    concurrency: Optional[int] = None
+    refresh: bool = False
+
+async def paginas_por_periodo(token: str, start: Optional[str], end: Optional[str]) -> List[dict]:
+    prop = CONTENT_PLANNED["data_publicacao"].prop
+    if replica_fresh(CONTENT_PLANNED_DATABASE_ID):
+        pages = []
+        for p in replica.query(CONTENT_PLANNED_DATABASE_ID):
+            data = extract_post_insight(p["properties"])["data_publicacao"]
+            if data and (not start or data[:10] >= start) and (not end or data[:10] <= end):
+                pages.append(p)
+        return pages
+
+    filtros = []
+    if start:
+        filtros.append({"property": prop, "date": {"on_or_after": start}})
+    if end:
+        filtros.append({"property": prop, "date": {"on_or_before": end}})
+    pages = []
+    async for batch in notion.query_database(CONTENT_PLANNED_DATABASE_ID, token, {"filter": {"and": filtros}}):
+        pages.extend(batch)
+    return pages
+
+@app.post("/notion/insight/batch")
+async def gerar_insights_em_lote(body: InsightBatch):
+    """
+    Insight de vários posts de uma vez (lista de page_ids ou período start/end).
+    As páginas são buscadas em paralelo e as chamadas ao LLM rodam com até `concurrency`
+    simultâneas; cada resultado sai como uma linha NDJSON assim que fica pronto, fora de ordem.
+    A última linha traz o resumo (`done`).
+    """
+    if not body.page_ids and not (body.start or body.end):
+        raise HTTPException(400, "Informe page_ids ou start/end")
+
     token = get_token()
-    url = f"https://api.notion.com/v1/pages/{page_id}"
-    resp = requests.get(url, headers=notion_headers(token))
+    if body.page_ids:
+        alvos = [(page_id, None) for page_id in dict.fromkeys(body.page_ids)]
+    else:
+        alvos = [(p["id"], p) for p in await paginas_por_periodo(token, body.start, body.end)]
+    if len(alvos) > INSIGHT_BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"Máximo de {INSIGHT_BATCH_MAX_ITEMS} posts por lote")
+
+    limite = max(1, min(body.concurrency or INSIGHT_BATCH_CONCURRENCY, INSIGHT_BATCH_MAX_CONCURRENCY))
+    sem = asyncio.Semaphore(limite)
+
+    async def processar(page_id: str, page: Optional[dict]) -> dict:
+        try:
+            if page is not None:
+                data = extract_post_insight(page.get("properties", {}))
+            else:
+                data = await buscar_dados_postagem(page_id, token)
+            async with sem:
+                insight = await gerar_resposta(montar_prompt_postagem(data), refresh=body.refresh)
+            return {"page_id": page_id, "titulo": data.get("titulo"), "insight": insight}
+        except HTTPException as e:
+            return {"page_id": page_id, "erro": e.detail, "status_code": e.status_code}
+        except Exception as e:
+            return {"page_id": page_id, "erro": str(e)}
+
+    async def linhas():
+        tarefas = [asyncio.create_task(processar(pid, page)) for pid, page in alvos]
+        falhas = 0
+        try:
+            for pronta in asyncio.as_completed(tarefas):
+                resultado = await pronta
+                falhas += "erro" in resultado
+                yield json.dumps(resultado, ensure_ascii=False) + "\n"
+            yield json.dumps({"done": True, "total": len(tarefas), "failed": falhas}) + "\n"
+        finally:
+            # cliente desconectou: não deixa LLM rodando à toa
+            for t in tarefas:
+                t.cancel()
+
+    # Content-Encoding explícito tira o stream do GZipMiddleware, que seguraria as linhas no buffer
+    return StreamingResponse(linhas(), media_type="application/x-ndjson",
+                             headers={"Content-Encoding": "identity"})
 
-    if not resp.ok:
-        raise HTTPException(resp.status_code, resp.text)
 
-    props = resp.json().get("properties", {})
+# ---------- FUNÇÕES PARA INSIGHTS INDIVIDUAIS ----------
+async def buscar_dados_postagem(page_id, token: Optional[str] = None):
+    token = token or get_token()
+    resp = await notion.get(f"/pages/{page_id}", token)
 
-    plataformas_raw = safe_get(props, ["📱 Plataforma", "multi_select"], [])
-    plataformas = [tag["name"] for tag in plataformas_raw if "name" in tag]
+    if not resp.is_success:
+        raise HTTPException(resp.status_code, resp.text)
 
-    taxa_engajamento = safe_get(props, ["📊 Taxa de Engajamento", "formula", "number"],
-                                safe_get(props, ["📊 Taxa de Engajamento", "number"], 0))
+    return extract_post_insight(resp.json().get("properties", {}))
 
-    return {
-        "titulo": safe_get(props, ["📌 Título do Post", "title", 0, "plain_text"], "Sem título"),
-        "tipo": safe_get(props, ["🎨 Tipo", "rich_text", 0, "plain_text"]),
-        "data_publicacao": safe_get(props, ["📆 Data de Publicação", "date", "start"]),
-        "trafego_pago": safe_get(props, ["🚀 Tráfego Pago?", "select", "name"]),
-        "orcamento": safe_get(props, ["💰 Orçamento", "number"]),
-        "plataformas": plataformas,
-        "curtidas_7d": safe_get(props, ["❤️ Curtidas (7d)", "number"]),
-        "comentarios_7d": safe_get(props, ["💬 Comentários (7d)", "number"]),
-        "compartilhamentos_7d": safe_get(props, ["🔁 Compartilhamentos (7d)", "number"]),
-        "salvamentos_7d": safe_get(props, ["💾 Salvamentos (7d)", "number"]),
-        "alcance_7d": safe_get(props, ["👀 Alcance (7d)", "number"]),
-        "taxa_engajamento": taxa_engajamento
-    }
+async def gerar_resposta(prompt: str, refresh: bool = False):
+    """Chama o LLM, reaproveitando a resposta se o mesmo prompt já foi respondido (`refresh` ignora o cache)."""
+    key = cache_key(OPENAI_MODEL, OPENAI_TEMPERATURE, prompt)
+    if not refresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
 
-async def gerar_resposta(prompt: str):
-    from openai import AsyncOpenAI
-    client = AsyncOpenAI()
+    client = get_openai()
 
-    chat = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7
-    )
-    return chat.choices[0].message.content.strip()
+    start, usage, outcome = time.perf_counter(), None, "erro"
+    try:
+        chat = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=OPENAI_TEMPERATURE
+        )
+        usage, outcome = chat.usage, "ok"
+    finally:
+        observe_llm("completo", start, usage, outcome)
+    answer = chat.choices[0].message.content.strip()
+    llm_cache.set(key, answer)
+    return answer
+
+async def gerar_resposta_stream(prompt: str, refresh: bool = False):
+    """Versão em streaming de gerar_resposta: entrega os pedaços do texto conforme chegam."""
+    key = cache_key(OPENAI_MODEL, OPENAI_TEMPERATURE, prompt)
+    if not refresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    client = get_openai()
+
+    start, first, usage, outcome = time.perf_counter(), None, None, "erro"
+    try:
+        stream = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=OPENAI_TEMPERATURE,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        partes = []
+        async for chunk in stream:
+            # o último chunk traz só o usage, sem choices
+            usage = getattr(chunk, "usage", None) or usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if first is None:
+                    first = time.perf_counter() - start
+                partes.append(delta)
+                yield delta
+        outcome = "ok"
+    finally:
+        observe_llm("stream", start, usage, outcome, first)
+    # só guarda respostas completas
+    llm_cache.set(key, "".join(partes).strip())
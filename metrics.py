@@ -0,0 +1,217 @@
+import bisect, math, threading, time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from starlette.routing import Match
+
+# segundos; cobre desde leitura da réplica até chamada longa ao LLM
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return f"{{{body}}}" if body else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: esperava labels {self.labelnames}, recebeu {labels}")
+        return tuple(str(v) for v in labels)
+
+    def samples(self) -> List[Tuple[str, tuple, float]]:
+        with self._lock:
+            return [("", tuple(zip(self.labelnames, k)), v) for k, v in self._values.items()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [contagem por bucket (+Inf no fim), soma, total]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[Tuple[str, tuple, float]]:
+        out = []
+        with self._lock:
+            for key, (counts, total, n) in self._values.items():
+                labels = tuple(zip(self.labelnames, key))
+                acc = 0
+                for bound, count in zip(self.buckets + (math.inf,), counts):
+                    acc += count
+                    out.append(("_bucket", labels + (("le", _number(bound)),), acc))
+                out.append(("_sum", labels, total))
+                out.append(("_count", labels, n))
+        return out
+
+
+class Callback(Metric):
+    """Valor lido na hora do scrape (contadores que já existem em outros objetos, tamanho de fila...)."""
+
+    def __init__(self, name: str, help: str, kind: str, fn: Callable, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> List[Tuple[str, tuple, float]]:
+        value = self.fn()
+        if not isinstance(value, dict):
+            return [] if value is None else [("", (), value)]
+        return [("", tuple(zip(self.labelnames, k if isinstance(k, tuple) else (k,))), v)
+                for k, v in value.items() if v is not None]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels=()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, kind: str, fn: Callable, labels=()) -> Callback:
+        return self.register(Callback(name, help, kind, fn, labels))
+
+    def render(self) -> str:
+        """Formato texto do Prometheus (exposition 0.0.4)."""
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for suffix, labels, value in m.samples():
+                lines.append(f"{m.name}{suffix}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# ---------- INSTRUMENTAÇÃO HTTP ----------
+def route_template(scope) -> str:
+    """Caminho da rota (/notion/post/{page_id}), não a URL, para não explodir a cardinalidade."""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "<sem rota>"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: toda rota, inclusive as criadas depois, ganha contador, histograma de latência,
+    gauge de requisições em andamento e a latência da primeira chamada (custo de aquecimento).
+    Em streaming (SSE/NDJSON) a latência vai até o último byte.
+    """
+
+    def __init__(self, app, registry: Registry):
+        self.app = app
+        self.requests = registry.counter(
+            "http_requests_total", "Requisições HTTP atendidas", ("method", "route", "status"))
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "Latência das requisições HTTP até o fim do corpo", ("method", "route"))
+        self.in_flight = registry.gauge(
+            "http_requests_in_flight", "Requisições HTTP em andamento", ("method", "route"))
+        self.first = registry.gauge(
+            "http_first_request_duration_seconds", "Latência da primeira requisição de cada rota desde o startup",
+            ("method", "route"))
+        self._seen = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, route = scope["method"], route_template(scope)
+        status = "500"
+        start = time.perf_counter()
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                elapsed = time.perf_counter() - start
+                self.latency.observe(elapsed, method, route)
+                self.requests.inc(method, route, status)
+                if (method, route) not in self._seen:
+                    self._seen.add((method, route))
+                    self.first.set(elapsed, method, route)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        self.in_flight.inc(method, route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec(method, route)
+            finish()
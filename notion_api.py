@@ -0,0 +1,226 @@
+import json as jsonlib, random, asyncio, time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Optional
+
+import httpx
+
+from rate_limiter import RateLimiter, INTERACTIVE, WRITE
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+RETRY_STATUS = (429, 502, 503)
+
+# segmentos seguidos de um id na URL
+_ID_PARENTS = {"databases", "pages", "blocks", "users", "properties"}
+
+
+class NotionError(Exception):
+    """Resposta de erro da API do Notion (status + corpo original)."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"{status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def default_priority(method: str, path: str) -> int:
+    # databases/query e search são leituras mesmo sendo POST
+    if method == "GET" or path.endswith("/query") or path == "/search":
+        return INTERACTIVE
+    return WRITE
+
+
+def is_read(method: str, path: str) -> bool:
+    return method == "GET" or (method == "POST" and (path.endswith("/query") or path == "/search"))
+
+
+def endpoint_template(path: str) -> str:
+    """/databases/<id>/query -> /databases/{id}/query (rótulo de métrica sem cardinalidade por id)."""
+    parts, prev = [], None
+    for part in path.strip("/").split("/"):
+        parts.append("{id}" if prev in _ID_PARENTS else part)
+        prev = part
+    return "/" + "/".join(parts)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After em segundos ou em data HTTP."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class NotionAPI:
+    """
+    Cliente HTTP único para a API do Notion.
+    Mantém um pool de conexões keep-alive (HTTP/2) reaproveitado por todas as rotas;
+    deve ser aberto no startup do app e fechado no shutdown.
+    Toda chamada passa pelo RateLimiter e é repetida em 429/502/503 respeitando Retry-After.
+    `observer(method, endpoint, status, seconds, waited)` é chamado a cada tentativa
+    (waited = tempo na fila do RateLimiter); status "error" para falha de transporte.
+    """
+
+    def __init__(self, base_url: str = NOTION_API_URL, timeout: float = 30.0,
+                 max_connections: int = 20, max_keepalive: int = 10, http2: bool = True,
+                 limiter: Optional[RateLimiter] = None, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, coalesce: bool = True,
+                 observer: Optional[Callable] = None):
+        self.observer = observer
+        self.coalesce = coalesce
+        self.coalesced = 0
+        self._inflight = {}
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.base_url = base_url
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive)
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def open(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                headers={"Notion-Version": NOTION_VERSION},
+            )
+        return self
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, token: str,
+                      json: Optional[dict] = None, params=None,
+                      priority: Optional[int] = None) -> httpx.Response:
+        """
+        Leituras idênticas em andamento (mesmo método, caminho, parâmetros, corpo e token)
+        compartilham uma única chamada ao Notion (single-flight); a resposta não é guardada
+        depois que chega, então não há staleness.
+        """
+        if not (self.coalesce and is_read(method, path)):
+            return await self._send(method, path, token, json, params, priority)
+
+        key = (method, path, token,
+               jsonlib.dumps(params, sort_keys=True, default=str),
+               jsonlib.dumps(json, sort_keys=True, default=str))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._send(method, path, token, json, params, priority))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: se um dos interessados desistir, a chamada continua para os demais
+        return await asyncio.shield(task)
+
+    async def _send(self, method: str, path: str, token: str, json: Optional[dict],
+                    params, priority: Optional[int]) -> httpx.Response:
+        # abre sob demanda caso seja usado fora do lifespan (scripts, testes)
+        if self._client is None:
+            await self.open()
+        if priority is None:
+            priority = default_priority(method, path)
+
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            await self.limiter.acquire(priority)
+            start = time.perf_counter()
+            try:
+                resp = await self._client.request(
+                    method, path,
+                    headers={"Authorization": f"Bearer {token}"},
+                    json=json,
+                    params=params,
+                )
+            except httpx.HTTPError:
+                self._observe(method, path, "error", start, queued)
+                raise
+            self._observe(method, path, resp.status_code, start, queued)
+            if resp.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                return resp
+
+            delay = self._backoff(resp, attempt)
+            if resp.status_code == 429:
+                # o limite é por integração: segura todo mundo, não só esta chamada
+                self.limiter.pause(delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _observe(self, method: str, path: str, status, start: float, queued: float):
+        if self.observer is not None:
+            self.observer(method, endpoint_template(path), str(status),
+                          time.perf_counter() - start, start - queued)
+
+    def _backoff(self, resp: httpx.Response, attempt: int) -> float:
+        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+        if retry_after is not None:
+            base = retry_after
+        else:
+            base = self.backoff_base * (2 ** attempt)
+        # jitter para não sincronizar as repetições de chamadas concorrentes
+        return min(self.backoff_max, base + random.uniform(0, base * 0.25 + 0.1))
+
+    async def get(self, path: str, token: str, params=None, priority: Optional[int] = None) -> httpx.Response:
+        return await self.request("GET", path, token, params=params, priority=priority)
+
+    async def post(self, path: str, token: str, json: Optional[dict] = None,
+                   priority: Optional[int] = None, params=None) -> httpx.Response:
+        return await self.request("POST", path, token, json=json, params=params, priority=priority)
+
+    async def patch(self, path: str, token: str, json: Optional[dict] = None,
+                    priority: Optional[int] = None) -> httpx.Response:
+        return await self.request("PATCH", path, token, json=json, priority=priority)
+
+    # ---------- PAGINAÇÃO ----------
+    async def paginate(self, method: str, path: str, token: str,
+                       body: Optional[dict] = None, page_size: int = 100,
+                       priority: Optional[int] = None) -> AsyncIterator[list]:
+        """
+        Segue `next_cursor` e entrega cada página de resultados assim que chega.
+        POST (databases/query, search) leva o cursor no corpo; GET (blocks/children) na query string.
+        Respostas de erro são levantadas como NotionError.
+        """
+        cursor = None
+        while True:
+            if method == "GET":
+                params = {"page_size": page_size}
+                if cursor:
+                    params["start_cursor"] = cursor
+                resp = await self.request("GET", path, token, params=params, priority=priority)
+            else:
+                payload = dict(body or {})
+                payload.setdefault("page_size", page_size)
+                if cursor:
+                    payload["start_cursor"] = cursor
+                resp = await self.request(method, path, token, json=payload, priority=priority)
+
+            if not resp.is_success:
+                raise NotionError(resp.status_code, resp.text)
+
+            data = resp.json()
+            yield data.get("results", [])
+
+            cursor = data.get("next_cursor")
+            if not data.get("has_more") or not cursor:
+                break
+
+    def query_database(self, database_id: str, token: str, body: Optional[dict] = None,
+                       page_size: int = 100, priority: Optional[int] = None) -> AsyncIterator[list]:
+        return self.paginate("POST", f"/databases/{database_id}/query", token, body, page_size, priority)
@@ -0,0 +1,266 @@
+import json, time, uuid, sqlite3, asyncio, threading, logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from replica import normalize_id
+
+log = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+def retryable(exc: Exception) -> bool:
+    """Rede, 429, 409 (conflito de edição) e 5xx voltam para a fila; o resto (400/404/422...) é definitivo."""
+    if isinstance(exc, httpx.HTTPError):
+        return True
+    status = getattr(exc, "status_code", None)
+    return status is not None and (status in (409, 429) or status >= 500)
+
+
+def error_text(exc: Exception) -> str:
+    # NotionError traz o corpo em `text`, HTTPException em `detail`
+    detail = getattr(exc, "text", None) or getattr(exc, "detail", None)
+    return detail if isinstance(detail, str) else json.dumps(detail, ensure_ascii=False) if detail else str(exc)
+
+
+class Outbox:
+    """
+    Fila durável (SQLite) de escritas no Notion. Cada job tem uma chave de ordenação
+    (o page_id normalizado; criações usam o próprio id): jobs com a mesma chave saem na ordem de entrada.
+    A entrega é "pelo menos uma vez": um timeout, um 5xx ou um job em andamento quando o processo caiu
+    voltam para a fila mesmo que o Notion já tenha aplicado a escrita. Atualizações e arquivamentos
+    repetidos chegam ao mesmo resultado; criações precisam conferir antes de repetir (ver `attempt`).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                page_id TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                status_code INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+        """)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, kind: str, payload: dict, page_id: Optional[str] = None) -> dict:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO jobs (id, kind, key, page_id, payload, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, kind, normalize_id(page_id) if page_id else job_id, page_id,
+                  json.dumps(payload, ensure_ascii=False), QUEUED, now, now))
+            self._conn.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT id, kind, page_id, status, attempts, result, error, status_code, created_at, updated_at
+                FROM jobs WHERE id = ?
+            """, (job_id,)).fetchone()
+        if row is None:
+            return None
+        job_id, kind, page_id, status, attempts, result, error, status_code, created_at, updated_at = row
+        job = {"job_id": job_id, "kind": kind, "page_id": page_id, "status": status, "attempts": attempts,
+               "created_at": _iso(created_at), "updated_at": _iso(updated_at)}
+        if result is not None:
+            job["result"] = json.loads(result)
+        if error is not None:
+            job.update(error=error, status_code=status_code)
+        return job
+
+    def claim(self, busy: Set[str], mergeable=()) -> Tuple[Optional[dict], Optional[float]]:
+        """
+        Marca como `running` o job mais antigo que pode sair agora: chave fora de `busy`
+        e nenhum job anterior da mesma chave ainda na fila (nem esperando retry).
+        Se o tipo estiver em `mergeable`, leva junto os jobs seguintes da mesma chave enquanto
+        também forem de tipos `mergeable` (ids em `ids`, payloads em ordem em `payloads`).
+        Sem job disponível, devolve também quando vence o próximo retry.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, key, payload, attempts, next_attempt_at FROM jobs WHERE status = ? ORDER BY seq",
+                (QUEUED,)).fetchall()
+            blocked, next_due = set(busy), None
+            for i, (job_id, kind, key, payload, attempts, next_at) in enumerate(rows):
+                if key in blocked:
+                    continue
+                blocked.add(key)
+                if next_at > now:
+                    next_due = next_at if next_due is None else min(next_due, next_at)
+                    continue
+                claimed = [(job_id, payload)]
+                if kind in mergeable:
+                    for other_id, other_kind, other_key, other_payload, _, other_next in rows[i + 1:]:
+                        if other_key != key:
+                            continue
+                        if other_kind not in mergeable or other_next > now:
+                            break
+                        claimed.append((other_id, other_payload))
+                ids = [c[0] for c in claimed]
+                self._conn.execute(
+                    f"UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? "
+                    f"WHERE id IN ({','.join('?' * len(ids))})", (RUNNING, now, *ids))
+                self._conn.commit()
+                return {"id": job_id, "ids": ids, "kind": kind, "key": key,
+                        "payload": json.loads(payload), "payloads": [json.loads(c[1]) for c in claimed],
+                        "attempts": attempts + 1}, None
+        return None, next_due
+
+    def _set(self, job_ids: List[str], **fields):
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {cols} WHERE id IN ({','.join('?' * len(job_ids))})",
+                               (*fields.values(), *job_ids))
+            self._conn.commit()
+
+    def finish(self, job_ids: List[str], result: dict):
+        self._set(job_ids, status=DONE, result=json.dumps(result, ensure_ascii=False), error=None, status_code=None)
+
+    def fail(self, job_ids: List[str], error: str, status_code: Optional[int]):
+        self._set(job_ids, status=FAILED, error=error, status_code=status_code)
+
+    def retry(self, job_ids: List[str], delay: float, error: str, status_code: Optional[int]):
+        self._set(job_ids, status=QUEUED, next_attempt_at=time.time() + delay, error=error, status_code=status_code)
+
+    def requeue_running(self) -> int:
+        """Jobs que estavam rodando quando o processo caiu voltam para a fila (na mesma posição)."""
+        with self._lock:
+            count = self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)).rowcount
+            self._conn.commit()
+        return count
+
+    def prune(self, older_than: float) -> int:
+        """Apaga jobs concluídos (ok ou com falha) mais antigos que `older_than` segundos."""
+        with self._lock:
+            count = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than)).rowcount
+            self._conn.commit()
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)} | dict(rows)
+
+
+class OutboxWorker:
+    """
+    Esvazia o Outbox com `concurrency` tarefas. O ritmo é o do RateLimiter do NotionAPI
+    (as escritas entram com prioridade WRITE); falhas temporárias voltam à fila com backoff exponencial.
+    Jobs seguidos da mesma página com tipo em `mergeable` saem juntos: `merge(payloads)` monta um
+    payload único, executado pelo handler do primeiro, e o resultado vale para todos.
+    Cada handler recebe `(payload, attempt)`; `attempt > 1` quer dizer que uma tentativa anterior
+    pode ter chegado ao Notion (timeout, 5xx, queda do processo).
+    """
+
+    def __init__(self, outbox: Outbox, handlers: Dict[str, Callable[[dict, int], Awaitable[dict]]],
+                 concurrency: int = 3, max_attempts: int = 8, base_delay: float = 2.0,
+                 max_delay: float = 300.0, retention: float = 7 * 24 * 3600,
+                 mergeable=(), merge: Optional[Callable[[List[dict]], dict]] = None):
+        self.outbox = outbox
+        self.handlers = handlers
+        self.mergeable = frozenset(mergeable) if merge else frozenset()
+        self.merge = merge
+        self.merged = 0
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retention = retention
+        self._busy: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self):
+        """Chamado após cada enqueue: acorda os workers parados."""
+        self._wake.set()
+
+    async def _run_job(self, job: dict):
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise ValueError(f"Tipo de job desconhecido: {job['kind']}")
+            payload = job["payload"] if len(job["ids"]) == 1 else self.merge(job["payloads"])
+            result = await handler(payload, job["attempts"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            status_code = getattr(e, "status_code", None)
+            if retryable(e) and job["attempts"] < self.max_attempts:
+                delay = min(self.max_delay, self.base_delay * 2 ** (job["attempts"] - 1))
+                self.outbox.retry(job["ids"], delay, error_text(e), status_code)
+            else:
+                if status_code is None and not isinstance(e, httpx.HTTPError):
+                    log.exception("Job %s (%s) falhou", job["id"], job["kind"])
+                self.outbox.fail(job["ids"], error_text(e), status_code)
+        else:
+            self.merged += len(job["ids"]) - 1
+            self.outbox.finish(job["ids"], result or {})
+
+    async def _worker(self):
+        while True:
+            self._wake.clear()
+            job, next_due = self.outbox.claim(self._busy, self.mergeable)
+            if job is None:
+                timeout = None if next_due is None else max(0.0, next_due - time.time())
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._busy.add(job["key"])
+            try:
+                await self._run_job(job)
+            finally:
+                self._busy.discard(job["key"])
+                # libera o próximo job da mesma chave (e o retry que acabou de ser agendado)
+                self._wake.set()
+
+    def start(self):
+        if self._tasks:
+            return
+        requeued = self.outbox.requeue_running()
+        if requeued:
+            log.warning("%d job(s) interrompidos voltaram para a fila", requeued)
+        self.outbox.prune(self.retention)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # o que estava rodando fica `running` no banco e volta para a fila no próximo start
@@ -0,0 +1,78 @@
+import time, heapq, asyncio, itertools
+from typing import Optional
+
+# prioridades: menor valor é atendido primeiro
+INTERACTIVE = 0   # leituras feitas em nome de quem está esperando a resposta
+WRITE = 1         # escritas individuais (create/update/delete)
+BULK = 2          # lotes e tarefas de fundo (create-posts, sincronização da réplica)
+
+
+class RateLimiter:
+    """
+    Token bucket compartilhado pelo processo, com fila de prioridade.
+    `rate` fichas por segundo, até `burst` acumuladas. Quem espera é atendido por prioridade
+    e, dentro da mesma prioridade, por ordem de chegada. `pause()` congela o bucket
+    (usado quando o Notion devolve 429 com Retry-After).
+    """
+
+    def __init__(self, rate: float = 3.0, burst: int = 3):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def acquire(self, priority: int = INTERACTIVE):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # ficha já concedida mas não usada volta para o bucket
+            if fut.done() and not fut.cancelled():
+                self._tokens = min(self.burst, self._tokens + 1)
+            raise
+
+    def pause(self, seconds: float):
+        """Ninguém recebe ficha nos próximos `seconds` segundos."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = min(self._tokens, 0.0)
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            start = max(self._updated, self._blocked_until)
+            if now > start:
+                self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+            self._updated = now
+
+    def _dispatch(self):
+        now = time.monotonic()
+        self._refill(now)
+
+        if now >= self._blocked_until:
+            while self._waiters and self._tokens >= 1:
+                _, _, fut = heapq.heappop(self._waiters)
+                if fut.done():
+                    continue
+                self._tokens -= 1
+                fut.set_result(None)
+
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+
+        if self._waiters and self._timer is None:
+            delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate, 0.0)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
@@ -0,0 +1,318 @@
+import json, time, sqlite3, asyncio, threading, logging
+from typing import Iterable, List, Optional, Tuple
+
+from notion_api import NotionAPI
+from rate_limiter import BULK
+
+log = logging.getLogger(__name__)
+
+
+def normalize_id(notion_id: str) -> str:
+    """IDs do Notion aparecem com e sem hífens; a réplica usa sempre a forma sem hífens."""
+    return (notion_id or "").replace("-", "").lower()
+
+
+def _select_name(page: dict, prop: str) -> Optional[str]:
+    select = (page.get("properties", {}).get(prop) or {}).get("select") or {}
+    return select.get("name")
+
+
+class Replica:
+    """
+    Cópia local (SQLite) das páginas de bancos do Notion.
+    Guarda o JSON completo de cada página + a marca d'água de sincronização por banco.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id TEXT PRIMARY KEY,
+                database_id TEXT NOT NULL,
+                created_time TEXT,
+                last_edited_time TEXT,
+                archived INTEGER NOT NULL DEFAULT 0,
+                archived_at REAL,
+                updated_at REAL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_db_created
+                ON pages (database_id, archived, created_time DESC);
+            CREATE INDEX IF NOT EXISTS pages_db_edited
+                ON pages (database_id, last_edited_time);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                database_id TEXT PRIMARY KEY,
+                watermark TEXT,
+                synced_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(pages)")}
+        if "archived_at" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN archived_at REAL")
+        if "updated_at" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN updated_at REAL")
+        self._conn.commit()
+        self._listeners = []
+        self._last_write = 0.0
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'workspace_id'").fetchone()
+        self.workspace_id: Optional[str] = row[0] if row else None
+
+    def _write_clock(self) -> float:
+        """Relógio local das escritas (chamar com o lock): estritamente crescente, mesmo com duas no mesmo instante."""
+        self._last_write = max(time.time(), self._last_write + 1e-6)
+        return self._last_write
+
+    def bind(self, workspace_id: str) -> bool:
+        """
+        Fixa o workspace que a réplica espelha. Se o arquivo guardava outro workspace,
+        as páginas e as marcas d'água dele são descartadas (a próxima sincronização é completa).
+        """
+        with self._lock:
+            cleared = self.workspace_id not in (None, workspace_id)
+            if cleared:
+                self._conn.execute("DELETE FROM pages")
+                self._conn.execute("DELETE FROM sync_state")
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('workspace_id', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (workspace_id,))
+            self._conn.commit()
+            self.workspace_id = workspace_id
+        return cleared
+
+    def subscribe(self, listener):
+        """`listener` recebe `upsert(pages)` e `remove(page_ids)` a cada mudança (ex.: TitleIndex)."""
+        self._listeners.append(listener)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------- ESCRITA ----------
+    def upsert(self, pages: Iterable[dict], database_id: Optional[str] = None) -> int:
+        pages = list(pages)
+        rows = []
+        for page in pages:
+            db = database_id or (page.get("parent") or {}).get("database_id")
+            if not db or "id" not in page:
+                continue
+            archived = 1 if page.get("archived") or page.get("in_trash") else 0
+            rows.append((
+                normalize_id(page["id"]), normalize_id(db),
+                page.get("created_time"), page.get("last_edited_time"),
+                archived, json.dumps(page, ensure_ascii=False),
+            ))
+        if not rows:
+            return 0
+        with self._lock:
+            now = self._write_clock()
+            # página idêntica à guardada (ex.: a borda repetida do sync incremental) não conta como escrita
+            self._conn.executemany("""
+                INSERT INTO pages (id, database_id, created_time, last_edited_time, archived, archived_at,
+                                   updated_at, data)
+                VALUES (?1, ?2, ?3, ?4, ?5, CASE WHEN ?5 = 1 THEN ?7 END, ?7, ?6)
+                ON CONFLICT(id) DO UPDATE SET
+                    database_id = excluded.database_id,
+                    created_time = excluded.created_time,
+                    last_edited_time = excluded.last_edited_time,
+                    archived = excluded.archived,
+                    archived_at = CASE WHEN excluded.archived = 1
+                                       THEN COALESCE(pages.archived_at, excluded.archived_at) END,
+                    updated_at = excluded.updated_at,
+                    data = excluded.data
+                WHERE pages.data IS NOT excluded.data OR pages.database_id IS NOT excluded.database_id
+            """, [row + (now,) for row in rows])
+            self._conn.commit()
+        for listener in self._listeners:
+            listener.upsert(pages)
+        return len(rows)
+
+    def mark_archived(self, page_id: str):
+        with self._lock:
+            now = self._write_clock()
+            self._conn.execute(
+                "UPDATE pages SET archived = 1, archived_at = COALESCE(archived_at, ?), updated_at = ? "
+                "WHERE id = ? AND archived = 0",
+                (now, now, normalize_id(page_id)))
+            self._conn.commit()
+        for listener in self._listeners:
+            listener.remove([page_id])
+
+    def prune(self, database_id: str, keep_ids: Iterable[str]):
+        """Após uma carga completa, marca como arquivadas as páginas que não vieram mais do Notion."""
+        db = normalize_id(database_id)
+        keep = {normalize_id(i) for i in keep_ids}
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT id FROM pages WHERE database_id = ? AND archived = 0", (db,))]
+            now = self._write_clock()
+            gone = [(now, now, i) for i in ids if i not in keep]
+            self._conn.executemany(
+                "UPDATE pages SET archived = 1, archived_at = ?, updated_at = ? WHERE id = ?", gone)
+            self._conn.commit()
+        for listener in self._listeners:
+            listener.remove([i for (_, _, i) in gone])
+        return len(gone)
+
+    def set_synced(self, database_id: str, watermark: Optional[str]):
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO sync_state (database_id, watermark, synced_at) VALUES (?, ?, ?)
+                ON CONFLICT(database_id) DO UPDATE SET
+                    watermark = COALESCE(excluded.watermark, sync_state.watermark),
+                    synced_at = excluded.synced_at
+            """, (normalize_id(database_id), watermark, time.time()))
+            self._conn.commit()
+
+    # ---------- LEITURA ----------
+    def sync_state(self, database_id: str) -> Tuple[Optional[str], Optional[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark, synced_at FROM sync_state WHERE database_id = ?",
+                (normalize_id(database_id),)).fetchone()
+        return row if row else (None, None)
+
+    def is_fresh(self, database_id: str, max_staleness: float) -> bool:
+        _, synced_at = self.sync_state(database_id)
+        return synced_at is not None and time.time() - synced_at <= max_staleness
+
+    def version(self, database_id: str) -> tuple:
+        """
+        Assinatura barata do conteúdo do banco: muda a cada página nova, editada ou arquivada.
+        Usa o relógio local das escritas (updated_at): o last_edited_time do Notion é arredondado
+        para o minuto e não distingue duas edições no mesmo minuto.
+        """
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT COUNT(*), MAX(updated_at) FROM pages
+                WHERE database_id = ?
+            """, (normalize_id(database_id),)).fetchone()
+        return tuple(row)
+
+    def database_of(self, page_id: str) -> Optional[str]:
+        """Banco ao qual a página pertence (None se ela nunca passou pela réplica)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT database_id FROM pages WHERE id = ?", (normalize_id(page_id),)).fetchone()
+        return row[0] if row else None
+
+    def query(self, database_id: str, limit: Optional[int] = None,
+              select_equals: Optional[Tuple[str, str]] = None) -> List[dict]:
+        """Equivalente local de databases/query ordenado por created_time desc."""
+        sql = "SELECT data FROM pages WHERE database_id = ? AND archived = 0 ORDER BY created_time DESC"
+        with self._lock:
+            rows = self._conn.execute(sql, (normalize_id(database_id),)).fetchall()
+
+        pages = []
+        for (data,) in rows:
+            page = json.loads(data)
+            if select_equals and _select_name(page, select_equals[0]) != select_equals[1]:
+                continue
+            pages.append(page)
+            if limit and len(pages) >= limit:
+                break
+        return pages
+
+
+    def changed_since(self, database_id: str, watermark: Optional[str],
+                      archived_after: float = 0.0) -> List[dict]:
+        """
+        Páginas editadas a partir de `watermark` (last_edited_time do Notion) e páginas arquivadas
+        depois de `archived_after` (relógio local). Cada página volta com `archived` e `archived_at`.
+        """
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT data, archived, archived_at FROM pages
+                WHERE database_id = ?
+                  AND ((archived = 0 AND (? IS NULL OR last_edited_time >= ?))
+                       OR (archived = 1 AND archived_at > ?))
+            """, (normalize_id(database_id), watermark, watermark, archived_after)).fetchall()
+
+        pages = []
+        for data, archived, archived_at in rows:
+            page = json.loads(data)
+            page["archived"] = bool(archived)
+            page["archived_at"] = archived_at
+            pages.append(page)
+        return pages
+
+
+class ReplicaSync:
+    """
+    Mantém a réplica em dia em segundo plano.
+    Primeira execução: carga completa. Depois: só o delta via filtro de last_edited_time,
+    com uma carga completa periódica para detectar páginas removidas direto no Notion.
+    """
+
+    def __init__(self, replica: Replica, notion: NotionAPI, database_ids: List[str],
+                 interval: float = 30.0, full_every: float = 3600.0):
+        self.replica = replica
+        self.notion = notion
+        self.database_ids = database_ids
+        self.interval = interval
+        self.full_every = full_every
+        self._last_full = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def mirrors(self, database_id: str) -> bool:
+        return normalize_id(database_id) in {normalize_id(d) for d in self.database_ids}
+
+    async def sync(self, database_id: str, token: str, full: bool = False) -> int:
+        watermark, _ = self.replica.sync_state(database_id)
+        full = full or watermark is None
+
+        body = {}
+        if not full:
+            # last_edited_time tem granularidade de minuto: on_or_after repete a borda, o upsert é idempotente
+            body["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": watermark}}
+
+        seen, newest, count = [], watermark, 0
+        async for pages in self.notion.query_database(database_id, token, body, priority=BULK):
+            count += await asyncio.to_thread(self.replica.upsert, pages, database_id)
+            for page in pages:
+                edited = page.get("last_edited_time")
+                if edited and (newest is None or edited > newest):
+                    newest = edited
+                if full:
+                    seen.append(page["id"])
+
+        if full:
+            await asyncio.to_thread(self.replica.prune, database_id, seen)
+            self._last_full[normalize_id(database_id)] = time.monotonic()
+        self.replica.set_synced(database_id, newest)
+        return count
+
+    async def sync_all(self, token: str):
+        for database_id in self.database_ids:
+            last_full = self._last_full.get(normalize_id(database_id))
+            full = last_full is None or time.monotonic() - last_full >= self.full_every
+            await self.sync(database_id, token, full=full)
+
+    async def _run(self, get_token):
+        while True:
+            try:
+                await self.sync_all(get_token())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Falha ao sincronizar a réplica do Notion")
+            await asyncio.sleep(self.interval)
+
+    def start(self, get_token):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(get_token))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,286 @@
+"""
+Executa um fluxo de ações do agente (NDJSON, uma por linha) no Kanban do Notion.
+Substitui os scripts de uma ação só (create_idea.py, update_post.py, update_status.py,
+delete_post.py, list_ideas.py, gpt_notifier.py).
+
+    python run_actions.py acoes.ndjson
+    cat acoes.ndjson | python run_actions.py --concurrency 8
+
+Ações (formato do agente_config.json): create_post_idea, update_post, update_status, delete_post, list_ideas.
+Os títulos são resolvidos num índice único, carregado uma vez, e Status/Tipo de post são conferidos
+contra o schema do banco (buscado uma vez) antes de escrever; ações independentes rodam em paralelo
+sob o RateLimiter, e ações sobre o mesmo card respeitam a ordem de entrada.
+Sai uma linha JSON por ação, na ordem em que terminam (`linha` aponta a entrada).
+"""
+import os, sys, json, asyncio, argparse
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, TextIO
+
+from dotenv import load_dotenv
+
+from notion_api import NotionAPI, NotionError, NOTION_API_URL
+from rate_limiter import INTERACTIVE, WRITE
+from title_index import TitleIndex, normalize_title
+from block_diff import paragraph_blocks, sync_paragraphs
+from db_schema import SchemaCache, SchemaError
+
+STATUS_PADRAO = "💡 Ideias para Post"
+
+
+class ActionError(Exception):
+    """Ação inválida ou card inexistente (vira uma linha de erro, não derruba o lote)."""
+
+
+def _hashtags(value) -> str:
+    return " ".join(value) if isinstance(value, list) else (value or "")
+
+
+def card_keys(action: dict) -> List[str]:
+    """Cards tocados pela ação (títulos normalizados); update_post que renomeia toca os dois."""
+    keys = [action.get("title")]
+    if action.get("action") == "update_post":
+        keys.append((action.get("updates") or {}).get("title"))
+    return [normalize_title(k) for k in keys if k]
+
+
+class ActionExecutor:
+    def __init__(self, notion: NotionAPI, token: str, database_id: str):
+        self.notion = notion
+        self.token = token
+        self.database_id = database_id
+        self.index: Optional[TitleIndex] = None
+        self._index_lock = asyncio.Lock()
+        self.schemas = SchemaCache(notion)
+        self.handlers: Dict[str, Callable[[dict], Awaitable[dict]]] = {
+            "create_post_idea": self.create_post_idea,
+            "update_post": self.update_post,
+            "update_status": self.update_status,
+            "delete_post": self.delete_post,
+            "list_ideas": self.list_ideas,
+        }
+
+    # ---------- ÍNDICE DE TÍTULOS ----------
+    async def titles(self) -> TitleIndex:
+        """Carregado na primeira ação que precisa dele; todas as ações seguintes reaproveitam."""
+        async with self._index_lock:
+            if self.index is None:
+                index = TitleIndex()
+                async for batch in self.notion.query_database(self.database_id, self.token, priority=INTERACTIVE):
+                    index.upsert(batch)
+                self.index = index
+        return self.index
+
+    async def resolve(self, title: Optional[str]) -> dict:
+        if not title:
+            raise ActionError("Campo 'title' obrigatório")
+        matches = (await self.titles()).lookup(title)
+        if not matches:
+            raise ActionError(f"Card não encontrado: {title}")
+        result = {"page_id": matches[0]["page_id"]}
+        if len(matches) > 1:
+            # mesmo critério da API: o editado mais recentemente
+            result["duplicados"] = len(matches)
+        return result
+
+    async def check(self, props: dict):
+        """Opção inexistente vira erro da ação, sem escrita (o Notion criaria a opção em silêncio)."""
+        try:
+            await self.schemas.validate(self.database_id, self.token, props, priority=INTERACTIVE)
+        except SchemaError as e:
+            raise ActionError(str(e))
+
+    async def _patch_page(self, page_id: str, body: dict) -> dict:
+        resp = await self.notion.patch(f"/pages/{page_id}", self.token, json=body, priority=WRITE)
+        if not resp.is_success:
+            raise NotionError(resp.status_code, resp.text)
+        return resp.json()
+
+    # ---------- AÇÕES ----------
+    async def create_post_idea(self, action: dict) -> dict:
+        title = action.get("title") or "🧠 Ideia sem título"
+        props = {
+            "Nome": {"title": [{"text": {"content": title}}]},
+            "Status": {"select": {"name": action.get("status") or STATUS_PADRAO}},
+        }
+        if action.get("type"):
+            props["Tipo de post"] = {"select": {"name": action["type"]}}
+        if action.get("date"):
+            props["Data de postagem"] = {"date": {"start": action["date"]}}
+        if action.get("hashtags"):
+            props["Hashtags"] = {"rich_text": [{"text": {"content": _hashtags(action["hashtags"])}}]}
+        await self.check(props)
+
+        body = {"parent": {"database_id": self.database_id}, "properties": props}
+        if action.get("description"):
+            body["children"] = paragraph_blocks(action["description"])
+
+        resp = await self.notion.post("/pages", self.token, json=body, priority=WRITE)
+        if not resp.is_success:
+            raise NotionError(resp.status_code, resp.text)
+        page = resp.json()
+        (await self.titles()).upsert([page])
+        return {"page_id": page["id"]}
+
+    async def update_post(self, action: dict) -> dict:
+        updates = action.get("updates") or {}
+        if not updates:
+            raise ActionError("Campo 'updates' vazio")
+        result = await self.resolve(action.get("title"))
+
+        props = {}
+        if "title" in updates:
+            props["Nome"] = {"title": [{"text": {"content": updates["title"]}}]}
+        if "status" in updates:
+            props["Status"] = {"select": {"name": updates["status"]}}
+        if "type" in updates:
+            props["Tipo de post"] = {"select": {"name": updates["type"]}}
+        if "hashtags" in updates:
+            props["Hashtags"] = {"rich_text": [{"text": {"content": _hashtags(updates["hashtags"])}}]}
+        if "date" in updates:
+            props["Data de postagem"] = {"date": {"start": updates["date"]}}
+
+        if props:
+            await self.check(props)
+            page = await self._patch_page(result["page_id"], {"properties": props})
+            (await self.titles()).upsert([page])
+        if updates.get("description"):
+            plan = await sync_paragraphs(self.notion, result["page_id"], self.token,
+                                         updates["description"].strip(), priority=WRITE)
+            result["copy"] = {"mantidos": len(plan.kept), "editados": len(plan.update),
+                              "arquivados": len(plan.archive), "criados": len(plan.append)}
+        return result
+
+    async def update_status(self, action: dict) -> dict:
+        if not action.get("status"):
+            raise ActionError("Campo 'status' obrigatório")
+        props = {"Status": {"select": {"name": action["status"]}}}
+        await self.check(props)
+        result = await self.resolve(action.get("title"))
+        page = await self._patch_page(result["page_id"], {"properties": props})
+        (await self.titles()).upsert([page])
+        return result
+
+    async def delete_post(self, action: dict) -> dict:
+        result = await self.resolve(action.get("title"))
+        await self._patch_page(result["page_id"], {"archived": True})
+        (await self.titles()).remove([result["page_id"]])
+        return result
+
+    async def list_ideas(self, action: dict) -> dict:
+        filtros = action.get("filter_by") or {}
+        condicoes = []
+        if filtros.get("status"):
+            condicoes.append({"property": "Status", "select": {"equals": filtros["status"]}})
+        if filtros.get("type"):
+            condicoes.append({"property": "Tipo de post", "select": {"equals": filtros["type"]}})
+        body = {"filter": {"and": condicoes}} if condicoes else None
+
+        ideias = []
+        async for batch in self.notion.query_database(self.database_id, self.token, body, priority=INTERACTIVE):
+            for page in batch:
+                nome = (page.get("properties", {}).get("Nome") or {}).get("title") or []
+                ideias.append({"page_id": page["id"], "title": "".join(t.get("plain_text", "") for t in nome)})
+        return {"total": len(ideias), "ideias": ideias}
+
+    # ---------- EXECUÇÃO ----------
+    async def execute(self, line: int, action: dict) -> dict:
+        name = action.get("action")
+        out = {"linha": line, "action": name}
+        if action.get("title"):
+            out["title"] = action["title"]
+        handler = self.handlers.get(name)
+        try:
+            if handler is None:
+                raise ActionError(f"Ação desconhecida: {name}")
+            out.update(status="ok", **await handler(action))
+        except ActionError as e:
+            out.update(status="erro", erro=str(e))
+        except NotionError as e:
+            out.update(status="erro", status_code=e.status_code, erro=e.text)
+        except Exception as e:
+            out.update(status="erro", erro=f"{type(e).__name__}: {e}")
+        return out
+
+    async def run(self, lines: AsyncIterator[str], concurrency: int, emit: Callable[[dict], None]) -> List[dict]:
+        """
+        Cada ação espera só a ação anterior sobre os mesmos cards (cadeia por título);
+        o resto corre em paralelo, até `concurrency` de cada vez.
+        """
+        sem = asyncio.Semaphore(concurrency)
+        last: Dict[str, asyncio.Task] = {}
+        tasks = []
+
+        async def step(line: int, action: dict, deps: List[asyncio.Task]) -> dict:
+            for dep in deps:
+                await asyncio.wait([dep])   # falha do anterior não impede o seguinte
+            async with sem:
+                result = await self.execute(line, action)
+            emit(result)
+            return result
+
+        line = 0
+        async for raw in lines:
+            line += 1
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                action = json.loads(raw)
+                if not isinstance(action, dict):
+                    raise ValueError("esperado um objeto JSON")
+            except ValueError as e:
+                result = {"linha": line, "status": "erro", "erro": f"JSON inválido: {e}"}
+                emit(result)
+                continue
+            keys = card_keys(action)
+            deps = [last[k] for k in keys if k in last]
+            task = asyncio.create_task(step(line, action, deps))
+            for k in keys:
+                last[k] = task
+            tasks.append(task)
+
+        return list(await asyncio.gather(*tasks))
+
+
+async def read_lines(source: TextIO) -> AsyncIterator[str]:
+    """Lê fora do event loop: com stdin em pipe, as ações já lidas rodam enquanto chegam as próximas."""
+    while True:
+        raw = await asyncio.to_thread(source.readline)
+        if not raw:
+            return
+        yield raw
+
+
+def emit_line(result: dict):
+    print(json.dumps(result, ensure_ascii=False), flush=True)
+
+
+async def main_async(args) -> int:
+    load_dotenv()
+    token = os.getenv("NOTION_TOKEN")
+    database_id = args.database_id or os.getenv("NOTION_DATABASE_ID")
+    if not token or not database_id:
+        print("❌ Defina NOTION_TOKEN e NOTION_DATABASE_ID (ou --database-id).", file=sys.stderr)
+        return 2
+
+    source = sys.stdin if args.file == "-" else open(args.file, "r", encoding="utf-8")
+    notion = await NotionAPI(base_url=os.getenv("NOTION_API_URL", NOTION_API_URL)).open()
+    try:
+        executor = ActionExecutor(notion, token, database_id)
+        results = await executor.run(read_lines(source), args.concurrency, emit_line)
+    finally:
+        await notion.aclose()
+        if source is not sys.stdin:
+            source.close()
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Executa ações do agente (NDJSON) no Kanban do Notion")
+    parser.add_argument("file", nargs="?", default="-", help="arquivo NDJSON (padrão: stdin)")
+    parser.add_argument("--concurrency", type=int, default=8, help="ações em paralelo (o ritmo é do RateLimiter)")
+    parser.add_argument("--database-id", help="padrão: NOTION_DATABASE_ID")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main_async(parse_args())))
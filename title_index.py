@@ -0,0 +1,131 @@
+import bisect, threading, unicodedata
+from typing import Dict, Iterable, List, Optional
+
+TITLE_PROPERTIES = ("Nome", "📌 Título do Post")
+
+
+def normalize_title(title: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados: 'Reels  de Verão' -> 'reels de verao'."""
+    decomposed = unicodedata.normalize("NFKD", title or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def _id_key(page_id: str) -> str:
+    return (page_id or "").replace("-", "").lower()
+
+
+def page_titles(page: dict) -> List[str]:
+    titles = []
+    props = page.get("properties", {})
+    for name in TITLE_PROPERTIES:
+        parts = (props.get(name) or {}).get("title") or []
+        text = "".join(p.get("plain_text") or (p.get("text") or {}).get("content", "") for p in parts)
+        if text.strip():
+            titles.append(text.strip())
+    return titles
+
+
+class TitleIndex:
+    """
+    Índice título -> páginas, mantido de forma incremental (upsert/remove por página).
+    A busca exata é um lookup em dict; a busca por prefixo usa bisect sobre as chaves ordenadas.
+    Títulos duplicados ficam todos no índice, ordenados do editado mais recentemente para o mais antigo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, Dict[str, dict]] = {}
+        self._by_page: Dict[str, List[str]] = {}
+        self._keys: List[str] = []
+        self._keys_dirty = False
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[dict]) -> "TitleIndex":
+        index = cls()
+        index.upsert(pages)
+        return index
+
+    def __len__(self):
+        return len(self._by_page)
+
+    # ---------- ATUALIZAÇÃO ----------
+    def upsert(self, pages: Iterable[dict]):
+        with self._lock:
+            for page in pages:
+                page_id = page.get("id")
+                if not page_id:
+                    continue
+                pid = _id_key(page_id)
+                self._discard(pid)
+                if page.get("archived") or page.get("in_trash"):
+                    continue
+                keys = []
+                for title in page_titles(page):
+                    key = normalize_title(title)
+                    if key in keys:
+                        continue
+                    if key not in self._by_key:
+                        self._by_key[key] = {}
+                        self._keys_dirty = True
+                    self._by_key[key][pid] = {
+                        "page_id": page_id,
+                        "title": title,
+                        "last_edited_time": page.get("last_edited_time") or "",
+                    }
+                    keys.append(key)
+                if keys:
+                    self._by_page[pid] = keys
+
+    def remove(self, page_ids: Iterable[str]):
+        with self._lock:
+            for page_id in page_ids:
+                self._discard(_id_key(page_id))
+
+    def _discard(self, pid: str):
+        for key in self._by_page.pop(pid, []):
+            entries = self._by_key.get(key)
+            if entries is None:
+                continue
+            entries.pop(pid, None)
+            if not entries:
+                del self._by_key[key]
+                self._keys_dirty = True
+
+    # ---------- CONSULTA ----------
+    def lookup(self, title: str) -> List[dict]:
+        """Todas as páginas cujo título normalizado é igual ao pedido (mais recente primeiro)."""
+        entries = self._by_key.get(normalize_title(title))
+        if not entries:
+            return []
+        return self._rank(title, list(entries.values()))
+
+    def best(self, title: str) -> Optional[str]:
+        matches = self.lookup(title)
+        return matches[0]["page_id"] if matches else None
+
+    def prefix(self, title: str, limit: int = 10) -> List[dict]:
+        """Páginas cujo título normalizado começa com o texto pedido."""
+        key = normalize_title(title)
+        if not key:
+            return []
+        with self._lock:
+            if self._keys_dirty:
+                self._keys = sorted(self._by_key)
+                self._keys_dirty = False
+            keys = self._keys
+            found = []
+            for i in range(bisect.bisect_left(keys, key), len(keys)):
+                if not keys[i].startswith(key):
+                    break
+                found.extend(self._by_key.get(keys[i], {}).values())
+                if len(found) >= limit:
+                    break
+        return self._rank(title, found)[:limit]
+
+    @staticmethod
+    def _rank(title: str, entries: List[dict]) -> List[dict]:
+        # grafia idêntica primeiro; entre iguais, o editado mais recentemente
+        entries.sort(key=lambda e: e["last_edited_time"], reverse=True)
+        entries.sort(key=lambda e: e["title"] != title.strip())
+        return entries
@@ -0,0 +1,90 @@
+import os, json, time, threading
+from typing import Optional
+
+
+class TokenStore:
+    """
+    Mantém o tokens.json em memória.
+    O arquivo só é relido quando o mtime muda (verificado no máximo a cada `check_interval`
+    segundos) ou quando `reload()` é chamado explicitamente (SIGHUP / rota admin).
+    """
+
+    def __init__(self, path: str, active_id: Optional[str] = None, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._preferred_id = active_id
+        self._lock = threading.Lock()
+        self._tokens: dict = {}
+        self._active_id: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    # ---------- CARGA ----------
+    def reload(self):
+        with self._lock:
+            self._load()
+        return self.active_id
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "r") as f:
+            tokens = json.load(f)
+        if not tokens:
+            raise RuntimeError(f"{self.path} não contém nenhum workspace")
+
+        self._tokens = tokens
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+        if self._preferred_id in tokens:
+            self._active_id = self._preferred_id
+        elif self._active_id not in tokens:
+            self._active_id = next(iter(tokens))
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._mtime is None:
+                self._load()
+                return
+            self._checked_at = now
+            try:
+                changed = os.stat(self.path).st_mtime != self._mtime
+            except FileNotFoundError:
+                # mantém a última versão válida em memória
+                return
+            if changed:
+                self._load()
+
+    # ---------- CONSULTA ----------
+    @property
+    def active_id(self) -> str:
+        self._refresh()
+        return self._active_id
+
+    def set_active(self, workspace_id: str):
+        self._refresh()
+        if workspace_id not in self._tokens:
+            raise KeyError(workspace_id)
+        self._preferred_id = workspace_id
+        self._active_id = workspace_id
+
+    def entry(self, workspace_id: Optional[str] = None) -> dict:
+        self._refresh()
+        return self._tokens[workspace_id or self._active_id]
+
+    def token(self, workspace_id: Optional[str] = None) -> str:
+        return self.entry(workspace_id)["access_token"]
+
+    def workspaces(self) -> dict:
+        """Resumo dos workspaces carregados, sem expor os tokens."""
+        self._refresh()
+        return {
+            wid: {
+                "workspace_name": data.get("workspace_name"),
+                "user": data.get("user"),
+                "active": wid == self._active_id,
+            }
+            for wid, data in self._tokens.items()
+        }
@@ -1,29 +1,22 @@
 import json
 import os
+import asyncio
 from dotenv import load_dotenv
-from notion_client import Client
+
+from notion_api import NotionAPI, NOTION_API_URL
+from run_actions import ActionExecutor
 
 load_dotenv()
-notion = Client(auth=os.getenv("NOTION_TOKEN"))
 database_id = os.getenv("NOTION_DATABASE_ID")
 
-def buscar_id_por_titulo(titulo):
-    query = notion.databases.query(database_id=database_id)
-    for resultado in query.get("results"):
-        props = resultado["properties"]
-        if props.get("Nome", {}).get("title"):
-            nome = props["Nome"]["title"][0]["text"]["content"]
-            if nome == titulo:
-                return resultado["id"]
-    return None
-
-def buscar_id_do_status(nome_status):
-    propriedades = notion.databases.retrieve(database_id)["properties"]
-    opcoes = propriedades["Status"]["select"]["options"]
-    for opcao in opcoes:
-        if opcao["name"] == nome_status:
-            return opcao["id"]
-    return None
+async def atualizar_status(titulo, novo_status):
+    # mesmo caminho do run_actions: título pelo índice, Status conferido no SchemaCache antes do PATCH
+    notion = await NotionAPI(base_url=os.getenv("NOTION_API_URL", NOTION_API_URL)).open()
+    try:
+        executor = ActionExecutor(notion, os.getenv("NOTION_TOKEN"), database_id)
+        return await executor.update_status({"title": titulo, "status": novo_status})
+    finally:
+        await notion.aclose()
 
 def main():
     json_input = input("📥 Cole aqui o JSON da atualização de status:\n").strip()
@@ -32,19 +25,9 @@ def main():
         titulo = dados["title"]
         novo_status = dados["new_status"]
 
-        card_id = buscar_id_por_titulo(titulo)
-        if not card_id:
-            print("❌ Card não encontrado.")
-            return
-
-        status_id = buscar_id_do_status(novo_status)
-        if not status_id:
-            print("❌ Status inválido.")
-            return
-
-        notion.pages.update(page_id=card_id, properties={
-            "Status": {"select": {"name": novo_status}}
-        })
+        resultado = asyncio.run(atualizar_status(titulo, novo_status))
+        if resultado.get("duplicados"):
+            print(f"⚠️ {resultado['duplicados']} cards com esse título; usando o editado mais recentemente.")
 
         print(f"✅ Status atualizado para '{novo_status}'")
     except Exception as e:
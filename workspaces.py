@@ -0,0 +1,122 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from token_store import TokenStore
+
+WORKSPACE_HEADER = b"x-notion-workspace"
+PATH_PREFIX = "/w/"
+
+# workspace da requisição em andamento; None = o ativo do tokens.json
+current_workspace: ContextVar[Optional[str]] = ContextVar("current_workspace", default=None)
+
+
+class Workspace:
+    """Recursos de um workspace: cliente Notion (pool de conexões + RateLimiter próprios) e caches."""
+
+    def __init__(self, workspace_id: str, notion, schemas, titles):
+        self.workspace_id = workspace_id
+        self.notion = notion
+        self.schemas = schemas
+        self.titles = titles
+
+
+class WorkspacePool:
+    """
+    Um Workspace por entrada do tokens.json, criado no primeiro uso.
+    A rajada de um cliente só consome a cota (RateLimiter) e as conexões do próprio workspace.
+    """
+
+    def __init__(self, tokens: TokenStore, factory: Callable[[str], Workspace]):
+        self.tokens = tokens
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._workspaces: Dict[str, Workspace] = {}
+
+    def current_id(self) -> str:
+        return current_workspace.get() or self.tokens.active_id
+
+    def get(self, workspace_id: Optional[str] = None) -> Workspace:
+        workspace_id = workspace_id or self.current_id()
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None:
+                self.tokens.entry(workspace_id)   # KeyError se não estiver no tokens.json
+                workspace = self._workspaces[workspace_id] = self.factory(workspace_id)
+            return workspace
+
+    def items(self) -> Dict[str, Workspace]:
+        with self._lock:
+            return dict(self._workspaces)
+
+    async def aclose(self):
+        for workspace in self.items().values():
+            await workspace.notion.aclose()
+
+
+class Current:
+    """
+    Encaminha para o objeto `attr` do workspace da requisição (fora de requisição, o ativo).
+    Permite que rotas e helpers continuem usando `notion`, `schemas` e `titles` como globais.
+    """
+
+    def __init__(self, pool: WorkspacePool, attr: str):
+        self._pool = pool
+        self._attr = attr
+
+    def __getattr__(self, name):
+        return getattr(getattr(self._pool.get(), self._attr), name)
+
+
+@contextmanager
+def use_workspace(workspace_id: Optional[str]):
+    """Fixa o workspace fora de uma requisição (ex.: jobs do outbox)."""
+    reset = current_workspace.set(workspace_id)
+    try:
+        yield
+    finally:
+        current_workspace.reset(reset)
+
+
+class WorkspaceMiddleware:
+    """
+    Middleware ASGI: escolhe o workspace pelo prefixo `/w/{workspace_id}/...` ou pelo header
+    `X-Notion-Workspace`. O prefixo vai para o root_path, então as rotas casam sem alteração.
+    Workspace fora do tokens.json responde 404.
+    """
+
+    def __init__(self, app, tokens: TokenStore):
+        self.app = app
+        self.tokens = tokens
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        workspace_id = None
+        root_path = scope.get("root_path", "")
+        path = scope["path"][len(root_path):] if scope["path"].startswith(root_path) else scope["path"]
+        if path.startswith(PATH_PREFIX):
+            workspace_id = path[len(PATH_PREFIX):].split("/", 1)[0]
+            scope = dict(scope, root_path=f"{root_path}{PATH_PREFIX}{workspace_id}")
+        else:
+            for key, value in scope["headers"]:
+                if key == WORKSPACE_HEADER:
+                    workspace_id = value.decode("latin-1").strip()
+                    break
+
+        if not workspace_id:
+            await self.app(scope, receive, send)
+            return
+        try:
+            self.tokens.entry(workspace_id)
+        except KeyError:
+            await JSONResponse({"detail": "Workspace not found"}, status_code=404)(scope, receive, send)
+            return
+
+        with use_workspace(workspace_id):
+            await self.app(scope, receive, send)
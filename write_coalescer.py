@@ -0,0 +1,61 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class _Batch:
+    def __init__(self):
+        self.props: dict = {}
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # exceção sem ninguém esperando (todos desistiram) não deve virar aviso no log
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+class PatchCoalescer:
+    """
+    Junta os PATCHes de propriedades de uma mesma página que chegam dentro de `window` segundos
+    em um único envio; para cada propriedade vale a última escrita. Todos os chamadores recebem
+    o resultado (ou o erro) do envio conjunto. Envios da mesma página nunca se sobrepõem:
+    o lote seguinte espera o anterior terminar.
+    """
+
+    def __init__(self, send: Callable[[Hashable, dict], Awaitable], window: float = 0.2):
+        self.send = send
+        self.window = window
+        self.merged = 0
+        self._pending: Dict[Hashable, _Batch] = {}
+        self._sending: Dict[Hashable, asyncio.Future] = {}
+        self._tasks = set()
+
+    async def patch(self, key: Hashable, props: dict):
+        if self.window <= 0:
+            return await self.send(key, props)
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            task = asyncio.create_task(self._flush(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.merged += 1
+        batch.props.update(props)
+        return await asyncio.shield(batch.future)
+
+    async def _flush(self, key: Hashable, batch: _Batch):
+        await asyncio.sleep(self.window)
+        previous = self._sending.get(key)
+        if previous is not None:
+            await asyncio.wait([previous])
+        # a partir daqui, novas escritas da página abrem outro lote
+        self._pending.pop(key, None)
+        self._sending[key] = batch.future
+        try:
+            batch.future.set_result(await self.send(key, batch.props))
+        except asyncio.CancelledError:
+            batch.future.cancel()
+            raise
+        except Exception as e:
+            batch.future.set_exception(e)
+        finally:
+            if self._sending.get(key) is batch.future:
+                del self._sending[key]